@@ -18,6 +18,9 @@ each IMA file:
 2. A master ASN file of those read fits files for a single IMA.
 3. An aligned version of the IMA read fits files.
 
+The ``quicklook`` function instead writes a small, roughly aligned
+preview of the IMA within seconds, for triage.
+
 Authors
 -------
     Rosalia O'Brien 2019
@@ -51,6 +54,7 @@ References
 """
 from glob import glob
 import os
+import time
 
 from astropy.convolution import convolve
 from astropy.convolution import Gaussian2DKernel
@@ -62,6 +66,7 @@ from drizzlepac import tweakreg
 from drizzlepac import astrodrizzle
 import lacosmicx #for fix_cosmic_rays
 import numpy as np
+from scipy import ndimage
 from stsci.tools import teal
 import stwcs
 from photutils import detect_sources #Needed for create_seg_map
@@ -146,7 +151,8 @@ class DashData(object):
               threshold = 50., cw = 3.5,
               searchrad=20., astrodriz=True,
               cat_file='catalogs/diff_catfile.cat',
-              drz_output=None, move_files=False):
+              drz_output=None, move_files=False,
+              drift_order=2, drift_nreads=None):
 
         '''
         Aligns new FLT's to reference catalog.
@@ -159,7 +165,9 @@ class DashData(object):
             If True, runs subtract_background_reads functions.
         align_method : string, optional
             Defines alignment method to be used. Default is None (input files
-            will align to each other).
+            will align to each other). Setting align_method to 'DRIFT' fits a
+            drift model to the shifts of the highest signal-to-noise files
+            with fit_drift instead of running TweakReg on every file.
         ref_catalog : cat file, optional
             Defines reference image that will be referenced for CATALOG
             alignment method.
@@ -194,6 +202,12 @@ class DashData(object):
             the root name of the original IMA.
         move_files : bool, optional
             If True, move files from alignment steps to folders.
+        drift_order : int, optional
+            Order of the drift model used by the DRIFT align method. Default
+            is 2.
+        drift_nreads : int, optional
+            Number of files on which shifts are measured by the DRIFT align
+            method. Default is half of the files.
 
 
         Outputs
@@ -266,6 +280,11 @@ class DashData(object):
 
                 raise Exception('Need to specify reference catalog and reference image.')
 
+        #Align images with a model of the drift
+        elif align_method == 'DRIFT':
+
+            self.fit_drift(order=drift_order, nreads=drift_nreads,
+                           updatehdr=updatehdr, wcsname=wcsname)
 
         #Align images to the first image
         else:
@@ -449,6 +468,137 @@ class DashData(object):
             raise Exception('Need to input list of difference files in order to make source list. List should include full path.')
 
 
+    def fit_drift(self, order=2, nreads=None, ref_read=0, block=1,
+                  updatehdr=True, wcsname='DASH', max_rms=0.25):
+        '''
+        Fits a low-order polynomial model of the drift against time to shifts
+        measured, by cross-correlation, on the highest signal-to-noise
+        difference files only. The model gives the shift of every difference
+        file, so faint reads do not need to be matched individually.
+
+        Parameters
+        ----------
+        self : object
+            DashData object created from an individual IMA file.
+        order : int, optional
+            Order of the polynomial drift model. Default is 2.
+        nreads : int, optional
+            Number of difference files, ranked by signal-to-noise, on which
+            shifts are measured. Default is half of the difference files, and
+            never fewer than order + 2.
+        ref_read : int, optional
+            Index of the difference file that the others are aligned to.
+            Default is 0, the first difference file. It is always measured.
+        block : int, optional
+            Block size, in pixels, used to downsample the difference files
+            before cross-correlating them. Default is 1 (full resolution).
+        updatehdr : bool, optional
+            If True, shifts the WCS of each difference file by its modeled
+            shift. Default is True.
+        wcsname : str, optional
+            Name given to the shifted WCS. Default is 'DASH'.
+        max_rms : float, optional
+            A warning is printed if the rms of the residuals of the measured
+            shifts around the model is larger than this, in pixels. Default
+            is 0.25 pixels.
+
+        Outputs
+        -------
+        Shifts file : txt file
+            File containing the modeled shifts, in the same format as the
+            TweakReg shift file.
+        Drift file : txt file
+            Table of the mid-read times, measured shifts, modeled shifts and
+            residuals of every difference file.
+        drift : Table
+            Same table as the drift file. Also added as the drift attribute
+            of the DashData object.
+        '''
+
+        input_images = sorted(glob('diff/{}_*_diff.fits'.format(self.root)))
+        nfiles = len(input_images)
+        if nfiles == 0:
+            raise Exception('No difference files found, run split_ima first.')
+        if nfiles <= order:
+            print('Only {} difference files, lowering the order of the drift model to {}.'.format(nfiles, nfiles - 1))
+            order = nfiles - 1
+        if nreads is None:
+            nreads = nfiles//2
+        nreads = min(max(nreads, order + 2), nfiles)
+
+        mid_time = np.zeros(nfiles)
+        images = []
+        for i, image in enumerate(input_images):
+            with fits.open(image) as diff:
+                exptime = diff[0].header['EXPTIME']
+                mid_time[i] = diff['TIME'].header['PIXVALUE'] - exptime/2.
+                good = (diff['DQ'].data == 0)[None]
+                images.append(block_reduce_reads(diff['SCI'].data[None], block, good=good)[0][0])
+
+        # Rank the difference files by the signal-to-noise of their brightest pixels
+        snr = np.zeros(nfiles)
+        for i, image in enumerate(images):
+            median = np.median(image)
+            sigma = 1.4826*np.median(np.abs(image - median))
+            snr[i] = (np.percentile(image, 99.9) - median)/max(sigma, 1e-10)
+
+        measured = np.zeros(nfiles, dtype=bool)
+        measured[np.argsort(snr)[::-1][:nreads]] = True
+        measured[ref_read] = True
+
+        dx_meas = np.full(nfiles, np.nan)
+        dy_meas = np.full(nfiles, np.nan)
+        for i in np.flatnonzero(measured):
+            dx, dy = cross_correlation_shift(images[i], images[ref_read])
+            dx_meas[i], dy_meas[i] = dx*block, dy*block
+
+        # The model is forced to zero shift at the reference read
+        t = mid_time - mid_time[ref_read]
+        dx_fit = np.polyfit(t[measured], dx_meas[measured], order)
+        dy_fit = np.polyfit(t[measured], dy_meas[measured], order)
+        dx_model = np.polyval(dx_fit, t) - np.polyval(dx_fit, 0.)
+        dy_model = np.polyval(dy_fit, t) - np.polyval(dy_fit, 0.)
+
+        dx_resid = dx_meas - dx_model
+        dy_resid = dy_meas - dy_model
+        xrms = np.sqrt(np.nanmean(dx_resid**2))
+        yrms = np.sqrt(np.nanmean(dy_resid**2))
+
+        print('Drift model of order {} fit to {} of {} reads, residual rms: x = {:.3f}, y = {:.3f} pixels'.format(
+              order, measured.sum(), nfiles, xrms, yrms))
+        if max(xrms, yrms) > max_rms:
+            print('Warning: drift model residuals are larger than {} pixels, check the shifts in the drift file.'.format(max_rms))
+
+        files = [os.path.basename(image) for image in input_images]
+        self.drift = Table([files, mid_time, measured, snr, dx_meas, dy_meas, dx_model, dy_model, dx_resid, dy_resid],
+                           names=['file', 'mid_time', 'measured', 'snr', 'dx_meas', 'dy_meas',
+                                  'dx_model', 'dy_model', 'dx_resid', 'dy_resid'])
+
+        if not os.path.exists('shifts'):
+            os.mkdir('shifts')
+        ascii.write(self.drift, 'shifts/drift_{}.txt'.format(self.root), format='fixed_width', overwrite=True)
+
+        with open('shifts/shifts_{}.txt'.format(self.root), 'w') as f:
+            f.write('# frame: input\n')
+            f.write('# refimage: {}\n'.format(files[ref_read]))
+            f.write('# form: delta\n')
+            f.write('# units: pixels\n')
+            for name, dx, dy in zip(files, dx_model, dy_model):
+                f.write('{} {:.4f} {:.4f} 0.0 1.0 {:.4f} {:.4f}\n'.format(name, dx, dy, xrms, yrms))
+
+        if updatehdr:
+            for image, dx, dy in zip(input_images, dx_model, dy_model):
+                with fits.open(image, mode='update') as diff:
+                    # A source at (x, y) in the reference read is at (x + dx, y + dy) in this read.
+                    # Any shift applied by a previous fit is undone first.
+                    diff['SCI'].header['CRPIX1'] += dx - diff['SCI'].header.get('DRIFTDX', 0.)
+                    diff['SCI'].header['CRPIX2'] += dy - diff['SCI'].header.get('DRIFTDY', 0.)
+                    diff['SCI'].header['WCSNAME'] = wcsname
+                    diff['SCI'].header['DRIFTDX'] = (dx, 'Modeled drift shift in x [pixels]')
+                    diff['SCI'].header['DRIFTDY'] = (dy, 'Modeled drift shift in y [pixels]')
+
+        return self.drift
+
     def fix_cosmic_rays(self, rm_custom=False, flag=None, **lacosmic_param):
         '''
         Resets cosmic rays within the seg maps of objects and uses L.A.Cosmic
@@ -528,6 +678,111 @@ class DashData(object):
             else:
                 raise Exception('Must specify which flags to remove.')
 
+    def group_reads(self, max_drift=0.5, bad_bits=1+256+1024+4096):
+        '''
+        Merges consecutive difference files whose cumulative drift stays
+        below a threshold, so alignment and drizzling run on fewer, deeper
+        files. Uses the modeled shifts of fit_drift, which is run first if
+        needed. Each pixel of a merged file is summed in electrons over the
+        difference files where it is good, with their exposure times added
+        and their errors added in quadrature, so a cosmic ray or bad pixel
+        in one difference file does not reject or contaminate the others.
+        Pixels that are bad in every difference file are summed over all of
+        them and keep the DQ flags they all share. The SAMP and TIME arrays
+        hold the number of difference files and the exposure time summed in
+        each pixel.
+
+        Parameters
+        ----------
+        self : object
+            DashData object created from an individual IMA file.
+        max_drift : float, optional
+            Largest drift, in pixels, allowed between the first and any other
+            difference file of a group. Default is 0.5 pixels.
+        bad_bits : int, optional
+            DQ flags of the pixels left out of the sums. Default is dead
+            pixels (1), saturation (256), bad reference pixels (1024) and
+            cosmic rays (4096).
+
+        Outputs
+        -------
+        Grouped N files : fits files
+            Fits files of the merged difference files, named after the first
+            difference file of each group. The difference files that were
+            merged are moved to diff/ungrouped.
+        '''
+
+        if getattr(self, 'drift', None) is None:
+            self.fit_drift(updatehdr=False)
+
+        shifts = np.array([self.drift['dx_model'], self.drift['dy_model']]).T
+
+        groups = [[0]]
+        for i in range(1, len(shifts)):
+            if np.hypot(*(shifts[i] - shifts[groups[-1][0]])) < max_drift:
+                groups[-1].append(i)
+            else:
+                groups.append([i])
+
+        print('Grouping {} difference files into {} files.'.format(len(shifts), len(groups)))
+
+        if not os.path.exists('diff/ungrouped'):
+            os.mkdir('diff/ungrouped')
+
+        self.diff_files_list = []
+        for group in groups:
+            files = ['diff/{}'.format(self.drift['file'][i]) for i in group]
+            self.diff_files_list.append(files[0].replace('_diff.fits', ''))
+            if len(group) == 1:
+                continue
+
+            members = [fits.open(f) for f in files]
+            exptimes = np.array([m[0].header['EXPTIME'] for m in members])
+            exptime = exptimes.sum()
+
+            # Sum each pixel over the members where it is good, or over all
+            # of them where it is bad in every member
+            dqs = np.array([m['DQ'].data for m in members])
+            good = (dqs & bad_bits) == 0
+            any_good = good.any(axis=0)
+            use = good | ~any_good
+            t_use = np.tensordot(exptimes, use, axes=1)
+
+            counts = sum(np.where(u, m['SCI'].data.astype(np.float64)*t, 0.) for m, t, u in zip(members, exptimes, use))
+            var = sum(np.where(u, (m['ERR'].data.astype(np.float64)*t)**2, 0.) for m, t, u in zip(members, exptimes, use))
+            dq = np.where(any_good, np.bitwise_or.reduce(np.where(use, dqs, 0)),
+                          np.bitwise_and.reduce(dqs)).astype(dqs.dtype)
+            samp = use.sum(axis=0).astype(members[0]['SAMP'].data.dtype)
+
+            # The group is drizzled with the exposure weighted mean of the WCS shifts of its members
+            hdu = fits.HDUList([hdu.copy() for hdu in members[0]])
+            for key in ['CRPIX1', 'CRPIX2', 'DRIFTDX', 'DRIFTDY', 'MDRIZSKY']:
+                if all(key in m['SCI'].header for m in members):
+                    hdu['SCI'].header[key] = np.sum([m['SCI'].header[key]*t for m, t in zip(members, exptimes)])/exptime
+
+            hdu[0].header['EXPTIME'] = exptime
+            hdu[0].header['NCOMBINE'] = (len(group), 'Number of difference files merged')
+            hdu['SCI'].data = (counts/t_use).astype(members[0]['SCI'].data.dtype)
+            hdu['ERR'].data = (np.sqrt(var)/t_use).astype(members[0]['ERR'].data.dtype)
+            hdu['DQ'].data = dq
+            hdu['SAMP'].data = samp
+            hdu['TIME'].data = t_use.astype(hdu['TIME'].data.dtype)
+            hdu['TIME'].header['PIXVALUE'] = members[-1]['TIME'].header['PIXVALUE']
+
+            for m, f in zip(members, files):
+                m.close()
+                os.rename(f, f.replace('diff/', 'diff/ungrouped/'))
+
+            print('Writing {} from {} difference files'.format(files[0], len(group)))
+            hdu.writeto(files[0], overwrite=True)
+
+        # The shifts of the groups are measured again on the merged files,
+        # and the read differences of read_diffs no longer match the files
+        self.drift = None
+        self.diff = None
+        self.dt = None
+        self.dq = None
+
     def make_pointing_asn(self):
         """
         Makes a new association table for the reads extracted from a given IMA.
@@ -632,11 +887,12 @@ class DashData(object):
         for image in fits:
             os.rename(image, 'misc_tweakreg_files/' + image)
 
-    def split_ima(self):
+    def read_diffs(self):
         '''
-        Will create individual files for the difference between
-        adjacent reads of a IMA file. Will also add more attributes
-        to the DashData object.
+        Computes the differences between adjacent reads of the IMA file, in
+        electrons, without writing any files. Will also add the diff, dt and
+        dq attributes to the DashData object, excluding the difference
+        between the zeroth and first read.
 
         Parameters
         ----------
@@ -644,33 +900,62 @@ class DashData(object):
             DashData object created from an individual IMA file.
 
         Outputs
-        ----------
-        N files : fits files
-            Fits files of the difference between adjacent IMA reads.
-
+        -------
+        diff : array
+            (NSAMP-1)x1024x1024 cube of the differences between adjacent
+            reads in ascending time order.
+        dt : array
+            Time between adjacent reads, in seconds.
+        dq : array
+            NSAMPx1024x1024 cube of the DQ arrays of the reads in ascending
+            time order.
         '''
-        FLAT = fits.open(get_flat(self.file_name))
-        IDCtable = fits.open(get_IDCtable(self.file_name))
 
         NSAMP = self.ima_file[0].header['NSAMP']
         shape = self.ima_file['SCI',1].shape
 
         cube = np.zeros((NSAMP, shape[0], shape[1]), dtype='float32')
-        dq = np.zeros((NSAMP, shape[0], shape[1]), dtype=np.int)
-        time = np.zeros(NSAMP)
+        dq = np.zeros((NSAMP, shape[0], shape[1]), dtype=int)
+        read_time = np.zeros(NSAMP)
 
         for i in range(NSAMP):
             cube[NSAMP-1-i, :, :] = self.ima_file['SCI',i+1].data*self.ima_file['TIME',i+1].header['PIXVALUE']
             dq[NSAMP-1-i, :, :] = self.ima_file['DQ',i+1].data
-            time[NSAMP-1-i] = self.ima_file['TIME',i+1].header['PIXVALUE']
+            read_time[NSAMP-1-i] = self.ima_file['TIME',i+1].header['PIXVALUE']
 
         diff = np.diff(cube, axis=0)
         self.diff = diff[1:]
-        dt = np.diff(time)
+        dt = np.diff(read_time)
         self.dt = dt[1:]
 
         self.dq = dq[1:]
 
+        return diff, dt, dq
+
+    def split_ima(self):
+        '''
+        Will create individual files for the difference between
+        adjacent reads of a IMA file. Will also add more attributes
+        to the DashData object.
+
+        Parameters
+        ----------
+        self : object
+            DashData object created from an individual IMA file.
+
+        Outputs
+        ----------
+        N files : fits files
+            Fits files of the difference between adjacent IMA reads.
+
+        '''
+        FLAT = fits.open(get_flat(self.file_name))
+        IDCtable = fits.open(get_IDCtable(self.file_name))
+
+        NSAMP = self.ima_file[0].header['NSAMP']
+
+        diff, dt, dq = self.read_diffs()
+
         self.readnoise_2D = np.zeros((1024,1024), dtype='float32')
         self.readnoise_2D[512: ,0:512] += self.ima_file[0].header['READNSEA']
         self.readnoise_2D[0:512,0:512] += self.ima_file[0].header['READNSEB']
@@ -793,13 +1078,96 @@ class DashData(object):
             print('Background subtraction, {}_diff.fits:  {}'.format(exp, sky_level))
 
 
+def block_reduce_reads(reads, block, good=None):
+    '''
+    Block-averages a cube of reads, ignoring pixels that are not good.
+
+    Parameters
+    ----------
+    reads : array
+        Nx(ny)x(nx) cube of count rates.
+    block : int
+        Size of the square blocks, in pixels. Rows and columns that do not
+        fill a whole block are trimmed.
+    good : array, optional
+        Boolean cube with the same shape as reads. Pixels set to False do not
+        contribute to the block averages. Default is all pixels are good.
+
+    Outputs
+    -------
+    reduced : array
+        Nx(ny/block)x(nx/block) cube of block-averaged count rates.
+    coverage : array
+        Fraction of good pixels in each block.
+    '''
+
+    nread, ny, nx = reads.shape
+    ny, nx = (ny//block)*block, (nx//block)*block
+    if good is None:
+        good = np.ones(reads.shape, dtype=bool)
+
+    data = np.where(good, reads, 0.)[:, :ny, :nx]
+    good = good[:, :ny, :nx]
+
+    shape = (nread, ny//block, block, nx//block, block)
+    total = data.reshape(shape).sum(axis=(2,4))
+    npix = good.reshape(shape).sum(axis=(2,4))
+
+    reduced = total/np.maximum(npix, 1)
+    coverage = npix/float(block*block)
+
+    return reduced, coverage
+
+
+def cross_correlation_shift(image, reference):
+    '''
+    Measures the shift of an image relative to a reference image from the
+    peak of their FFT cross-correlation, refined to sub-pixel precision by
+    fitting a parabola through the peak along each axis.
+
+    Parameters
+    ----------
+    image : array
+        2D image to measure the shift of.
+    reference : array
+        2D reference image with the same shape as image.
+
+    Outputs
+    -------
+    dx, dy : float
+        Shift of the image relative to the reference along x and y, in
+        pixels. A source at (x, y) in the reference is found at
+        (x + dx, y + dy) in the image.
+    '''
+
+    img = np.nan_to_num(image - np.nanmedian(image))
+    ref = np.nan_to_num(reference - np.nanmedian(reference))
+
+    cc = np.fft.ifft2(np.fft.fft2(img)*np.conj(np.fft.fft2(ref))).real
+
+    ny, nx = cc.shape
+    iy, ix = np.unravel_index(np.argmax(cc), cc.shape)
+
+    shift = []
+    for peak, n, profile in ((ix, nx, cc[iy, [(ix-1)%nx, ix, (ix+1)%nx]]),
+                             (iy, ny, cc[[(iy-1)%ny, iy, (iy+1)%ny], ix])):
+        denom = profile[0] - 2*profile[1] + profile[2]
+        offset = 0.5*(profile[0] - profile[2])/denom if denom != 0 else 0.
+        if peak > n//2:
+            peak -= n
+        shift.append(peak + offset)
+
+    return shift[0], shift[1]
+
+
 def main(ima_file_name = None, flt_file_name = None,
          align_method = None, ref_catalog = None,
          drz_output=None, subtract_background = False,
          wcsname = 'DASH', threshold = 50., cw = 3.5,
          updatehdr=True, updatewcs=True,
          searchrad=20.,
-         astrodriz=True, cat_file = 'catalogs/diff_catfile.cat'):
+         astrodriz=True, cat_file = 'catalogs/diff_catfile.cat',
+         group_reads=False, max_drift=0.5, group_bad_bits=1+256+1024+4096):
 
     '''
     Runs entire DashData pipeline under a single function.
@@ -814,6 +1182,9 @@ def main(ima_file_name = None, flt_file_name = None,
         Method to align difference files using TweakReg. Default is None, which
         aligns reads to the first read.
         Setting align_method equal to 'CATALOG' will align the reads to a catalog.
+        Setting align_method equal to 'DRIFT' will align the reads with a
+        model of the drift fit to the shifts of the highest signal-to-noise
+        reads.
     ref_catalog : str, optional
         Catalog to be aligned to if using CATALOG align method.
     drz_output : str, optional
@@ -844,6 +1215,15 @@ def main(ima_file_name = None, flt_file_name = None,
         Name of catfile to be used to align sources in TweakReg. Default is
         the catfile created by setting create_diff_source_lists to True,
         catalogs/diff_catfile.cat
+    group_reads : bool, optional
+        Determines whether consecutive difference files that drifted by less
+        than max_drift are merged before aligning. Default is False.
+    max_drift : float, optional
+        Largest drift, in pixels, within a group of merged difference files.
+        Default is 0.5 pixels.
+    group_bad_bits : int, optional
+        DQ flags of the pixels left out when merging difference files.
+        Default is 1+256+1024+4096.
 
     Outputs
     -------
@@ -867,6 +1247,9 @@ def main(ima_file_name = None, flt_file_name = None,
 
     myDash.split_ima()
 
+    if group_reads:
+        myDash.group_reads(max_drift=max_drift, bad_bits=group_bad_bits)
+
     myDash.create_seg_map()
 
     diffpath = os.path.dirname(os.path.abspath('diff/{}_*_diff.fits'.format(myDash.root)))
@@ -884,3 +1267,116 @@ def main(ima_file_name = None, flt_file_name = None,
                  updatehdr=updatehdr, updatewcs=updatewcs, cat_file=cat_file,
                  searchrad=searchrad,
                  astrodriz=astrodriz)
+
+
+def quicklook(ima_file_name = None, block = 4, ref_read = 0,
+              bad_bits = 1+256+1024, output = None,
+              latency_budget = 10.):
+
+    '''
+    Produces a rough aligned DASH image for triage in a few seconds. Uses the
+    same read differences as split_ima, but skips the segmentation maps,
+    cosmic ray fixing, source catalogs, TweakReg and AstroDrizzle. The reads
+    are block-averaged, their shifts are measured by cross-correlation
+    against a reference read and they are co-added weighted by exposure
+    time.
+
+    Parameters
+    ----------
+    ima_file_name : str
+        File name of ima file.
+    block : int, optional
+        Block size, in pixels, used to downsample the reads. Default is 4.
+    ref_read : int, optional
+        Index of the difference read that the other reads are aligned to.
+        Default is 0, the first difference file written by split_ima.
+    bad_bits : int, optional
+        DQ flags of pixels that are left out of the co-add. Default are the
+        flags that are not ignored when drizzling in align.
+    output : str, optional
+        Name of the preview file. Default is
+        quicklook/<root>_quicklook.fits.
+    latency_budget : float, optional
+        Time, in seconds, the quicklook is expected to take. A warning is
+        printed if it takes longer. Default is 10 seconds.
+
+    Outputs
+    -------
+    Preview image : fits file
+        Block-averaged co-add of the difference reads, with the weights in the
+        WHT extension, the measured shifts in the SHIFTS extension and the
+        time spent on each step in the primary header.
+    timings : dict
+        Time, in seconds, spent reading, aligning, co-adding and in total.
+    '''
+
+    timings = {}
+    start = time.perf_counter()
+
+    myDash = DashData(ima_file_name)
+    diff, dt, dq = myDash.read_diffs()
+
+    # Same interior reads and 5 pixel border trim as split_ima
+    rates = diff[1:, 5:-5, 5:-5]/dt[1:, None, None]
+    good = (dq[2:, 5:-5, 5:-5] & bad_bits) == 0
+    dt = dt[1:]
+
+    reduced, coverage = block_reduce_reads(rates, block, good=good)
+    timings['read'] = time.perf_counter() - start
+
+    shifts = np.zeros((len(reduced), 2))
+    for i, image in enumerate(reduced):
+        if i != ref_read:
+            shifts[i] = cross_correlation_shift(image, reduced[ref_read])
+    timings['align'] = time.perf_counter() - start - timings['read']
+
+    sci = np.zeros(reduced.shape[1:])
+    wht = np.zeros(reduced.shape[1:])
+    for image, cov, exptime, (dx, dy) in zip(reduced, coverage, dt, shifts):
+        weight = ndimage.shift(cov*exptime, (-dy, -dx), order=1, cval=0.)
+        sci += weight*ndimage.shift(image, (-dy, -dx), order=1, cval=0.)
+        wht += weight
+    sci /= np.where(wht > 0, wht, 1.)
+    timings['coadd'] = time.perf_counter() - start - timings['read'] - timings['align']
+
+    if output is None:
+        if not os.path.exists('quicklook'):
+            os.mkdir('quicklook')
+        output = 'quicklook/{}_quicklook.fits'.format(myDash.root)
+
+    hdu0 = fits.PrimaryHDU(header=myDash.ima_file[0].header)
+    hdu0.header['QLBLOCK'] = (block, 'Quicklook block size in pixels')
+    hdu0.header['QLREF'] = (ref_read, 'Quicklook reference difference read')
+    hdu0.header['QLNREAD'] = (len(reduced), 'Number of co-added difference reads')
+
+    # Approximate WCS of the trimmed, block-averaged frame
+    hdr = myDash.ima_file['SCI',1].header.copy()
+    for key in ['CRPIX1', 'CRPIX2']:
+        if key in hdr:
+            hdr[key] = (hdr[key] - 5 - 0.5)/block + 0.5
+    for key in ['CD1_1', 'CD1_2', 'CD2_1', 'CD2_2']:
+        if key in hdr:
+            hdr[key] = hdr[key]*block
+
+    hdu1 = fits.ImageHDU(data=sci.astype(np.float32), header=hdr, name='SCI')
+    hdu2 = fits.ImageHDU(data=wht.astype(np.float32), name='WHT')
+    hdu3 = fits.BinTableHDU.from_columns([fits.Column(name='READ', format='J', array=np.arange(1, len(reduced)+1)),
+                fits.Column(name='EXPTIME', format='D', array=dt),
+                fits.Column(name='DX', format='D', array=shifts[:,0]*block),
+                fits.Column(name='DY', format='D', array=shifts[:,1]*block)], name='SHIFTS')
+
+    timings['total'] = time.perf_counter() - start
+    hdu0.header['QLTREAD'] = (timings['read'], 'Quicklook time reading reads [s]')
+    hdu0.header['QLTALIGN'] = (timings['align'], 'Quicklook time measuring shifts [s]')
+    hdu0.header['QLTCOADD'] = (timings['coadd'], 'Quicklook time co-adding [s]')
+    hdu0.header['QLTTOTAL'] = (timings['total'], 'Quicklook total time [s]')
+
+    fits.HDUList([hdu0, hdu1, hdu2, hdu3]).writeto(output, overwrite=True)
+
+    print('Writing {} in {:.2f} s (read {:.2f} s, align {:.2f} s, co-add {:.2f} s)'.format(
+          output, timings['total'], timings['read'], timings['align'], timings['coadd']))
+    if timings['total'] > latency_budget:
+        print('Warning: quicklook took {:.2f} s, more than the latency budget of {:.2f} s'.format(
+              timings['total'], latency_budget))
+
+    return timings
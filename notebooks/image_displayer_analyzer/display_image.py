@@ -1,11 +1,27 @@
 #! /usr/bin/env python
 
+import json
 import numpy as np
+import os
 import sys
 
 from astropy.io import fits
 from ginga.util import zscale
 import matplotlib.pyplot as plt
+from matplotlib import animation
+from matplotlib.colors import to_rgba
+from matplotlib.patches import Patch
+
+EXTNAMES = ['SCI', 'ERR', 'DQ']
+
+# Maximum number of pixels zscale is computed on
+ZSCALE_SAMPLES = 10000
+
+# zscale limits of the arrays already displayed, keyed by get_scale_key()
+zscale_cache = {}
+
+# Flags set in each of the 65536 possible DQ values, one column per bit
+DQ_BIT_LUT = ((np.arange(2**16)[:,None] >> np.arange(16)) & 1).astype(bool)
 
 def display_image(filename,
                   colormaps=['Greys_r','Greys_r','inferno_r'],
@@ -13,7 +29,10 @@ def display_image(filename,
                   printmeta=False,
                   ima_multiread=False,
                   figsize=(18,18),
-                  dpi=200):
+                  dpi=200,
+                  preview=False,
+                  animate=False,
+                  dq_bits=None):
 
     """ A function to display the 'SCI', 'ERR/WHT', and 'DQ/CTX' arrays
         of any WFC3 fits image. This function returns nothing, but will display
@@ -55,6 +74,9 @@ def display_image(filename,
         ginga.util.zscale.zscale(). All three scalings must be provided even if
         only changing 1-2 scalings. E.g. to change SCI array scaling:
         scaling = [(5E4,8E4),(None,None),(None,None)]
+        The zscale limits are computed on a regular subsample of the array
+        and cached for the file, extension and section, see
+        precompute_scale_limits().
 
     printmeta: Bool
         A boolean switch to turn on or off the printing of file infomation.
@@ -72,9 +94,29 @@ def display_image(filename,
     dpi: float
         The resolution of the figure in dots-per-inch. Default is 200
 
+    preview: Bool
+        If preview is True the SCI and ERR arrays are block averaged, and the
+        DQ array bitwise OR combined, down to the resolution of the figure
+        before being plotted, which makes displaying full frame images much
+        faster. Flags of all the pixels of a block are kept in the DQ preview.
+        Default is False
+
+    animate: Bool
+        If animate and ima_multiread are True the reads of the ima are shown
+        one after the other in a single figure, and the animation is returned.
+        See save_animation() to save it as a GIF, an MP4 or png frames. In a
+        notebook, play it with IPython.display.HTML(anim.to_jshtml()).
+        Default is False
+
+    dq_bits: List
+        DQ flag values, e.g. [16, 256], to show in color over the SCI array
+        in the DQ panel, with the number of pixels flagged with each of them,
+        instead of the DQ array. Default is None, which shows the DQ array.
+
     Returns
     -------
-    N/A
+    anim: FuncAnimation
+        Only if animate and ima_multiread are True, the animation of the reads.
 
     """
 
@@ -91,12 +133,6 @@ def display_image(filename,
                    in the filename")
             return 0, 0
 
-    with fits.open(imagename) as hdu:
-        h = hdu[0].header
-        h1 = hdu[1].header
-        h2 = hdu[2].header
-        h3 = hdu[3].header
-
     if not all_pixels:
         # pull the section off
         section = filename[section_start+1:-1]
@@ -132,181 +168,321 @@ def display_image(filename,
             print("Problem getting yend")
             return
 
-    bunit = get_bunit(h1)
-    detector = h['detector']
-    issubarray = h['subarray']
-    si = h['primesi']
-    fname = h['filename']
-    naxis1 = h1["NAXIS1"]
-    naxis2 = h1["NAXIS2"]
+    # Open the file once, memory-mapped, and only read the requested
+    # pixel window of each extension
+    with fits.open(imagename, memmap=True) as hdu:
+        h = hdu[0].header
+        h1 = hdu[1].header
+        h2 = hdu[2].header
+        h3 = hdu[3].header
 
-    if len(colormaps) < 3 or len(colormaps) > 3:
-        sys.exit(f"{len(colormaps)} colormaps proived. Must input all three")
+        bunit = get_bunit(h1)
+        detector = h['detector']
+        issubarray = h['subarray']
+        si = h['primesi']
+        fname = h['filename']
+        naxis1 = h1["NAXIS1"]
+        naxis2 = h1["NAXIS2"]
 
-    if len(scaling) < 3 or len(scaling) > 3:
-        sys.exit(f"{len(scaling)} scalings provided. Must input all three")
+        if len(colormaps) < 3 or len(colormaps) > 3:
+            sys.exit(f"{len(colormaps)} colormaps proived. Must input all three")
 
-    if printmeta:
-        print(f"\t{si}/{detector} {fname} ")
-        print('-'*44)
-        print(f"Filter = {h['filter']}, Date-Obs = {h['date-obs']} T{h['time-obs']},\nTarget = {h['targname']}, Exptime = {h['exptime']}, Subarray = {issubarray}, Units = {h1['bunit']}\n")
+        if len(scaling) < 3 or len(scaling) > 3:
+            sys.exit(f"{len(scaling)} scalings provided. Must input all three")
 
+        if printmeta:
+            print(f"\t{si}/{detector} {fname} ")
+            print('-'*44)
+            print(f"Filter = {h['filter']}, Date-Obs = {h['date-obs']} T{h['time-obs']},\nTarget = {h['targname']}, Exptime = {h['exptime']}, Subarray = {issubarray}, Units = {h1['bunit']}\n")
 
-    if detector == 'UVIS':
-        if ima_multiread == True:
-            sys.exit("keyword argument 'ima_multiread' can only be set to True for 'ima.fits' files")
-        try:
+
+        if detector == 'UVIS':
+            if ima_multiread == True:
+                sys.exit("keyword argument 'ima_multiread' can only be set to True for 'ima.fits' files")
+            try:
+                # Full frame UVIS images have a second chip
+                hdu.index_of(("SCI",2))
+                if all_pixels:
+                    xstart = 0
+                    ystart = 0
+                    xend = naxis1   # full x size
+                    yend = naxis2*2 # full y size
+
+                # UVIS2 (SCI,1) is stacked below UVIS1 (SCI,2)
+                fullsci = get_uvis_section(hdu, 1, 4, xstart, xend, ystart, yend)
+                fullerr = get_uvis_section(hdu, 2, 5, xstart, xend, ystart, yend)
+                fulldq = get_uvis_section(hdu, 3, 6, xstart, xend, ystart, yend)
+
+                if fullerr is not None and fulldq is not None:
+                    make1x3plot(scaling, colormaps, fullsci, fullerr, fulldq,
+                                xstart, xend, ystart, yend,
+                                detector, fname, h1, h2, h3,
+                                figsize, dpi, preview, imagename, dq_bits)
+                else:
+                    makeSCIplot(scaling, colormaps, fullsci,
+                                xstart, xend, ystart, yend,
+                                detector, fname, h1,
+                                figsize, dpi, preview, imagename)
+
+            except (IndexError,KeyError):
+
+                if all_pixels:
+                    xstart = 0
+                    ystart = 0
+                    xend = naxis1  # full x size
+                    yend = naxis2  # full y size
+
+                uvis_ext1 = get_section(hdu, 1, xstart, xend, ystart, yend)
+                uvis_ext2 = get_section(hdu, 2, xstart, xend, ystart, yend)
+                uvis_ext3 = get_section(hdu, 3, xstart, xend, ystart, yend)
+
+                if uvis_ext2 is not None and uvis_ext3 is not None:
+                    make1x3plot(scaling, colormaps, uvis_ext1, uvis_ext2, uvis_ext3,
+                                xstart, xend, ystart, yend,
+                                detector, fname, h1, h2, h3,
+                                figsize, dpi, preview, imagename, dq_bits)
+                else:
+                    makeSCIplot(scaling, colormaps, uvis_ext1,
+                                xstart, xend, ystart, yend,
+                                detector, fname, h1,
+                                figsize, dpi, preview, imagename)
+
+
+        if detector == 'IR' and '_ima.fits' not in fname:
+            if ima_multiread == True:
+                sys.exit("keyword argument 'ima_multiread' can only be set to True for 'ima.fits' files")
             if all_pixels:
                 xstart = 0
                 ystart = 0
-                xend = naxis1   # full x size
-                yend = naxis2*2 # full y size
+                xend =  naxis1 # full x size
+                yend =  naxis2 # full y size
 
-            with fits.open(imagename) as hdu:
-                uvis2_sci = hdu["SCI",1].data
-                uvis2_err = hdu[2].data
-                uvis2_dq = hdu[3].data
-                uvis1_sci = hdu["SCI",2].data
-                uvis1_err = hdu[5].data
-                uvis1_dq = hdu[6].data
+            data_sci = get_section(hdu, 1, xstart, xend, ystart, yend)
+            data_err = get_section(hdu, 2, xstart, xend, ystart, yend)
+            data_dq = get_section(hdu, 3, xstart, xend, ystart, yend)
 
-            try:
-                fullsci = np.concatenate([uvis2_sci,uvis1_sci])
-                fulldq = np.concatenate([uvis2_dq,uvis1_dq])
-                fullerr = np.concatenate([uvis2_err,uvis1_err])
+            if data_err is not None and data_dq is not None:
+                make1x3plot(scaling, colormaps, data_sci, data_err, data_dq,
+                            xstart, xend, ystart, yend,
+                            detector, fname, h1, h2, h3,
+                            figsize, dpi, preview, imagename, dq_bits)
+            else:
+                makeSCIplot(scaling, colormaps, data_sci,
+                            xstart, xend, ystart, yend,
+                            detector, fname, h1,
+                            figsize, dpi, preview, imagename)
 
-                fullsci = fullsci[ystart:yend,xstart:xend]
-                fulldq  = fulldq[ystart:yend,xstart:xend]
-                fullerr = fullerr[ystart:yend,xstart:xend]
 
-                make1x3plot(scaling, colormaps, fullsci, fullerr, fulldq,
+        if '_ima.fits' in fname:
+            if all_pixels:
+                xstart = 0
+                ystart = 0
+                xend =  naxis1 # full x size
+                yend =  naxis2 # full y size
+
+            if ima_multiread == True:
+                nsamps = h['NSAMP']
+                if animate:
+                    reads = [(ext,
+                              get_section(hdu, ('SCI',ext), xstart, xend, ystart, yend),
+                              get_section(hdu, ('ERR',ext), xstart, xend, ystart, yend),
+                              get_section(hdu, ('DQ',ext), xstart, xend, ystart, yend))
+                             for ext in reversed(range(1,nsamps+1))]
+
+                    return animateIR1x3plot(scaling, colormaps, reads,
+                                            xstart, xend, ystart, yend,
+                                            detector, fname, h1, h2, h3, nsamps,
+                                            figsize, dpi, preview, imagename, dq_bits)
+
+                for ext in reversed(range(1,nsamps+1)):
+                    data_sci = get_section(hdu, ('SCI',ext), xstart, xend, ystart, yend)
+                    data_err = get_section(hdu, ('ERR',ext), xstart, xend, ystart, yend)
+                    data_dq = get_section(hdu, ('DQ',ext), xstart, xend, ystart, yend)
+
+                    makeIR1x3plot(scaling, colormaps, data_sci, data_err, data_dq,
+                                    xstart, xend, ystart, yend,
+                                    detector, fname, h1, h2, h3, nsamps, ext,
+                                    figsize, dpi, preview, imagename, dq_bits)
+
+            if ima_multiread == False:
+                data_sci = get_section(hdu, ('SCI',1), xstart, xend, ystart, yend)
+                data_err = get_section(hdu, ('ERR',1), xstart, xend, ystart, yend)
+                data_dq = get_section(hdu, ('DQ',1), xstart, xend, ystart, yend)
+
+                make1x3plot(scaling, colormaps, data_sci, data_err, data_dq,
                             xstart, xend, ystart, yend,
                             detector, fname, h1, h2, h3,
-                            figsize, dpi)
+                            figsize, dpi, preview, imagename, dq_bits)
 
-            except ValueError:
-                fullsci = np.concatenate([uvis2_sci,uvis1_sci])
-                fullsci = fullsci[ystart:yend,xstart:xend]
+def get_section(hdu, ext, xstart, xend, ystart, yend):
+    """ Read only the requested pixel window of an image extension. For
+        uncompressed extensions only the rows that overlap the window are
+        read from disk.
 
-                z1_sci, z2_sci = get_scale_limits(scaling[0],fullsci,'SCI')
+    Parameters
+    ----------
+    hdu: HDUList
+        Opened fits file.
 
-                fig, ax1 = plt.subplots(1,1,figsize=figsize,dpi=dpi)
-                im1 = ax1.imshow(fullsci,origin='lower',extent=(xstart,xend,ystart,yend),cmap=colormaps[0],vmin=z1_sci, vmax=z2_sci)
-                if len(fname) > 18:
-                    ax1.set_title(f"WFC3/{detector} {fname}\n{h1['extname']} ext")
-                else:
-                    ax1.set_title(f"WFC3/{detector} {fname} {h1['extname']} ext")
-                fig.colorbar(im1, ax=ax1,shrink=.75,pad=.03)
+    ext: int, String or tuple
+        Extension number, name or (name, version).
 
-        except (IndexError,KeyError):
+    xstart, xend, ystart, yend: int
+        Pixel window, as slice bounds along the x and y axes.
 
-            if all_pixels:
-                    xstart = 0
-                    ystart = 0
-                    xend = naxis1  # full x size
-                    yend = naxis2  # full y size
+    Returns
+    -------
+    data: array or None
+        The pixel window, or None if the extension has no data (e.g. the
+        empty ERR and DQ arrays of raw files).
+    """
+    if hdu[ext].header['NAXIS'] == 0:
+        return None
+    return hdu[ext].section[ystart:yend,xstart:xend]
 
-            with fits.open(imagename) as hdu:
-                uvis_ext1 = hdu[1].data
-                uvis_ext2 = hdu[2].data
-                uvis_ext3 = hdu[3].data
+def get_uvis_section(hdu, uvis2_ext, uvis1_ext, xstart, xend, ystart, yend):
+    """ Read the pixel window of a full frame UVIS image in which the
+        UVIS2 chip is stacked below the UVIS1 chip. Only the rows of each
+        chip that fall inside the window are read, so the two chips are
+        never loaded or concatenated in full.
 
-            try:
-                uvis_ext1 = uvis_ext1[ystart:yend,xstart:xend]
-                uvis_ext2 = uvis_ext2[ystart:yend,xstart:xend]
-                uvis_ext3 = uvis_ext3[ystart:yend,xstart:xend]
+    Parameters
+    ----------
+    hdu: HDUList
+        Opened fits file.
 
-                make1x3plot(scaling, colormaps, uvis_ext1, uvis_ext2, uvis_ext3,
-                            xstart, xend, ystart, yend,
-                            detector, fname, h1, h2, h3,
-                            figsize, dpi)
+    uvis2_ext, uvis1_ext: int
+        Extension numbers of the UVIS2 and UVIS1 arrays.
 
-            except (TypeError,IndexError,AttributeError):
+    xstart, xend, ystart, yend: int
+        Pixel window of the stacked image, as slice bounds along the x and
+        y axes.
 
-                z1_sci, z2_sci = get_scale_limits(scaling[0],uvis_ext1,'SCI')
-                fig, ax1 = plt.subplots(1,1,figsize=figsize,dpi=dpi)
-                im1 = ax1.imshow(uvis_ext1,origin='lower',extent=(xstart,xend,ystart,yend),cmap=colormaps[0],vmin=z1_sci, vmax=z2_sci)
-                if len(fname) > 18:
-                    ax1.set_title(f"WFC3/{detector} {fname}\n{h1['extname']} ext")
-                else:
-                    ax1.set_title(f"WFC3/{detector} {fname} {h1['extname']} ext")
-                fig.colorbar(im1, ax=ax1,shrink=.75,pad=.03)
+    Returns
+    -------
+    data: array or None
+        The pixel window, or None if either chip has no data.
+    """
+    if hdu[uvis2_ext].header['NAXIS'] == 0 or hdu[uvis1_ext].header['NAXIS'] == 0:
+        return None
+
+    ny = hdu[uvis2_ext].header['NAXIS2']
+    chips = []
+    if ystart < ny:
+        chips.append(hdu[uvis2_ext].section[ystart:min(yend,ny),xstart:xend])
+    if yend > ny:
+        chips.append(hdu[uvis1_ext].section[max(ystart-ny,0):yend-ny,xstart:xend])
+    return np.concatenate(chips)
+
+def read_full_frame(imagename):
+    """ Read the full SCI, ERR and DQ arrays of a WFC3 fits image, with the
+        two chips of full frame UVIS images stacked as in display_image. For
+        ima files the final read is used.
 
+    Parameters
+    ----------
+    imagename: String
+        The name of the fits file.
+
+    Returns
+    -------
+    arrays: List
+        The SCI, ERR and DQ arrays. ERR and DQ are None if the file has no
+        data in those extensions.
+
+    section: (int,int,int,int)
+        The pixel window (xstart, xend, ystart, yend) of the arrays.
 
-    if detector == 'IR' and '_ima.fits' not in fname:
-        if ima_multiread == True:
-            sys.exit("keyword argument 'ima_multiread' can only be set to True for 'ima.fits' files")
-        if all_pixels:
-            xstart = 0
-            ystart = 0
-            xend =  naxis1 # full x size
-            yend =  naxis2 # full y size
+    headers: List
+        The primary header and the headers of extensions 1 to 3.
 
+    """
+    with fits.open(imagename, memmap=True) as hdu:
+        headers = [hdu[ext].header for ext in range(4)]
+        naxis1 = headers[1]['NAXIS1']
+        naxis2 = headers[1]['NAXIS2']
         try:
-            with fits.open(imagename) as hdu:
-                data_sci = hdu[1].data
-                data_err = hdu[2].data
-                data_dq = hdu[3].data
+            hdu.index_of(('SCI',2))
+            full_uvis = headers[0]['detector'] == 'UVIS'
+        except KeyError:
+            full_uvis = False
 
-            data_sci = data_sci[ystart:yend,xstart:xend]
-            data_err = data_err[ystart:yend,xstart:xend]
-            data_dq  = data_dq[ystart:yend,xstart:xend]
+        if full_uvis:
+            section = (0, naxis1, 0, naxis2*2)
+            arrays = [get_uvis_section(hdu, ext, ext+3, *section) for ext in (1,2,3)]
+        else:
+            section = (0, naxis1, 0, naxis2)
+            arrays = [get_section(hdu, ext, *section) for ext in (1,2,3)]
 
-            make1x3plot(scaling, colormaps, data_sci, data_err, data_dq,
-                        xstart, xend, ystart, yend,
-                        detector, fname, h1, h2, h3,
-                        figsize, dpi)
-
-        except (AttributeError, TypeError, ValueError):
-                z1_sci, z2_sci = get_scale_limits(scaling[0],data_sci,'SCI')
-                fig, ax1 = plt.subplots(1,1,figsize=figsize,dpi=dpi)
-                im1 = ax1.imshow(data_sci,origin='lower',extent=(xstart,xend,ystart,yend),cmap=colormaps[0],vmin=z1_sci, vmax=z2_sci)
-                if len(fname) > 18:
-                    ax1.set_title(f"WFC3/{detector} {fname}\n{h1['extname']} ext")
-                else:
-                    ax1.set_title(f"WFC3/{detector} {fname} {h1['extname']} ext")
-                fig.colorbar(im1, ax=ax1,shrink=.75,pad=.03)
-
-
-    if '_ima.fits' in fname:
-        if all_pixels:
-            xstart = 0
-            ystart = 0
-            xend =  naxis1 # full x size
-            yend =  naxis2 # full y size
-
-        if ima_multiread == True:
-            nsamps = h['NSAMP']
-            for ext in reversed(range(1,nsamps+1)):
-                with fits.open(imagename) as hdu:
-                    data_sci = hdu['SCI',ext].data
-                    data_err = hdu['ERR',ext].data
-                    data_dq  = hdu['DQ',ext].data
-
-                data_sci = data_sci[ystart:yend,xstart:xend]
-                data_err = data_err[ystart:yend,xstart:xend]
-                data_dq  = data_dq[ystart:yend,xstart:xend]
-
-                makeIR1x3plot(scaling, colormaps, data_sci, data_err, data_dq,
-                                xstart, xend, ystart, yend,
-                                detector, fname, h1, h2, h3, nsamps, ext,
-                                figsize, dpi)
+    return arrays, section, headers
 
-        if ima_multiread == False:
-            with fits.open(imagename) as hdu:
-                data_sci = hdu['SCI',1].data
-                data_err = hdu['ERR',1].data
-                data_dq  = hdu['DQ',1].data
+def makeSCIplot(scaling, colormaps, data_sci,
+                xstart, xend, ystart, yend,
+                detector, fname, h1,
+                figsize=(18,18), dpi=200, preview=False, imagename=None):
+    """ Plot the SCI array alone, for files without ERR and DQ data.
 
-            data_sci = data_sci[ystart:yend,xstart:xend]
-            data_err = data_err[ystart:yend,xstart:xend]
-            data_dq  = data_dq[ystart:yend,xstart:xend]
+    Parameters
+    ----------
+    scaling: List
+        List of real numbers to act as scalings for the SCI, ERR, and DQ arrays.
 
-            make1x3plot(scaling, colormaps, data_sci, data_err, data_dq,
-                        xstart, xend, ystart, yend,
-                        detector, fname, h1, h2, h3,
-                        figsize, dpi)
+    colormaps: List
+        List of colormaps strings for the SCI, ERR, and DQ arrays.
+
+    data_sci: array
+        SCI array pixel window.
+
+    xstart, xend, ystart, yend: int
+        Pixel window, used for the plot extent.
+
+    detector: String
+        WFC3 detector, 'UVIS' or 'IR'.
+
+    fname: String
+        Image file name.
 
+    h1: Header
+        Header of the SCI extension.
+
+    figsize: (float,float)
+        The width, height of the figure. Default is (18,18)
+
+    dpi: float
+        The resolution of the figure in dots-per-inch. Default is 200
+
+    preview: Bool
+        If True, block reduce the array to the resolution of the axis before
+        plotting it, see decimate(). Default is False
+
+    imagename: String
+        The name of the fits file, used to cache the zscale limits. Default is
+        None, which does not cache them.
+
+    Returns
+    -------
+    fig: Figure
+        The figure drawn.
+    """
+    key_sci = get_scale_key(imagename, h1, h1.get('extver',1), xstart, xend, ystart, yend)
+    z1_sci, z2_sci = get_scale_limits(scaling[0],data_sci,'SCI',key_sci)
+    fig, ax1 = plt.subplots(1,1,figsize=figsize,dpi=dpi)
+
+    extent = (xstart,xend,ystart,yend)
+    if preview:
+        factor = get_preview_factor(ax1, data_sci.shape)
+        if factor > 1:
+            data_sci = decimate(data_sci, factor, 'SCI')
+            extent = (xstart,xstart+data_sci.shape[1]*factor,ystart,ystart+data_sci.shape[0]*factor)
+
+    im1 = ax1.imshow(data_sci,origin='lower',extent=extent,cmap=colormaps[0],vmin=z1_sci, vmax=z2_sci)
+    if len(fname) > 18:
+        ax1.set_title(f"WFC3/{detector} {fname}\n{h1['extname']} ext")
+    else:
+        ax1.set_title(f"WFC3/{detector} {fname} {h1['extname']} ext")
+    fig.colorbar(im1, ax=ax1,shrink=.75,pad=.03)
+
+    return fig
 
 def get_bunit(ext1header):
     """ Get the brightness unit for the plot axis label
@@ -337,7 +513,7 @@ def get_bunit(ext1header):
         return units
 
 
-def get_scale_limits(scaling, array, extname):
+def get_scale_limits(scaling, array, extname, key=None):
     """ Get the scale limits to use for the image extension being displayed
 
     Parameters
@@ -357,6 +533,10 @@ def get_scale_limits(scaling, array, extname):
     extname: String {"SCI", "ERR", "DQ"}
         The name of the extension of which the scale is being determined
 
+    key: String
+        Key of the array in the zscale cache, see get_scale_key(). Default is
+        None, which does not cache the zscale limits.
+
     Returns
     -------
     z1: Float
@@ -381,13 +561,13 @@ def get_scale_limits(scaling, array, extname):
 
     elif extname == 'SCI' or extname == 'ERR':
         if scaling[0] == None and scaling[1] == None:
-            z1, z2 = zscale.zscale(array)
+            z1, z2 = get_zscale(array, key)
         elif scaling[0] == None and scaling[1] != None:
-            z1 = zscale.zscale(array)[0]
+            z1 = get_zscale(array, key)[0]
             z2 = scaling[1]
         elif scaling[0] != None and scaling[1] == None:
             z1 = scaling[0]
-            z2 = zscale.zscale(array)[1]
+            z2 = get_zscale(array, key)[1]
         elif scaling[0] != None and scaling[1] != None:
             z1 = scaling[0]
             z2 = scaling[1]
@@ -398,10 +578,378 @@ def get_scale_limits(scaling, array, extname):
     return z1, z2
 
 
+def get_scale_key(imagename, header, ext, xstart, xend, ystart, yend):
+    """ Get the key of an image section in the zscale cache
+
+    Parameters
+    ----------
+    imagename: String
+        The name of the fits file. None disables the cache.
+
+    header: Header
+        The header of the extension being displayed.
+
+    ext: Integer
+        The version of the extension being displayed.
+
+    xstart, xend, ystart, yend: Integer
+        The pixel window being displayed.
+
+    Returns
+    -------
+    The key, 'file.fits(mtime,size)[EXTNAME,ext][x1:x2,y1:y2]' with the
+    absolute path, modification time and size of the file, so that the
+    limits of a file that is rewritten (e.g. by flattenramp) are not reused,
+    or None if no imagename is given.
+
+    """
+    if imagename is None:
+        return None
+    stat = os.stat(imagename)
+    return (f"{os.path.abspath(imagename)}({stat.st_mtime},{stat.st_size})"
+            f"[{header['extname']},{ext}][{xstart}:{xend},{ystart}:{yend}]")
+
+
+def get_zscale(array, key=None, max_samples=ZSCALE_SAMPLES):
+    """ Get the zscale limits of an array from a regular subsample of at most
+        max_samples pixels, which gives the same limits every time the array
+        is displayed. The limits are stored in zscale_cache under key.
+
+    Parameters
+    ----------
+    array : Array
+        The ImageHDU array that is being displayed.
+
+    key: String
+        Key of the array in the zscale cache, see get_scale_key(). Default is
+        None, which does not cache the limits.
+
+    max_samples: Integer
+        Maximum number of pixels zscale is computed on.
+
+    Returns
+    -------
+    z1, z2: Float
+        The zscale limits
+
+    """
+    if key is not None and key in zscale_cache:
+        return zscale_cache[key]
+
+    step = int(np.ceil(np.sqrt(array.size/max_samples)))
+    while -(-array.shape[0]//step) * -(-array.shape[1]//step) > max_samples:
+        step += 1
+    z1, z2 = zscale.zscale(array[::step,::step])
+    limits = (float(z1), float(z2))
+
+    if key is not None:
+        zscale_cache[key] = limits
+    return limits
+
+
+def load_scale_limits(cache_file):
+    """ Add the zscale limits saved by precompute_scale_limits to the zscale
+        cache
+
+    Parameters
+    ----------
+    cache_file: String
+        The json file the limits were saved to.
+
+    Returns
+    -------
+    N/A
+
+    """
+    with open(cache_file) as f:
+        zscale_cache.update({key: tuple(limits) for key, limits in json.load(f).items()})
+
+
+def precompute_scale_limits(filenames, cache_file=None):
+    """ Compute the zscale limits of the full SCI and ERR arrays of WFC3 fits
+        images, e.g. while ingesting them, so that display_image does not have
+        to. For ima files the limits of every read are computed.
+
+    Parameters
+    ----------
+    filenames: List
+        The names of the fits files.
+
+    cache_file: String
+        A json file to save the zscale cache to, to be read back with
+        load_scale_limits(). Limits already saved in the file are kept.
+        Default is None, which only fills the cache of this session.
+
+    Returns
+    -------
+    N/A
+
+    """
+    if cache_file is not None and os.path.exists(cache_file):
+        load_scale_limits(cache_file)
+
+    for imagename in filenames:
+        with fits.open(imagename, memmap=True) as hdu:
+            fname = hdu[0].header['filename']
+            naxis1 = hdu[1].header['NAXIS1']
+            naxis2 = hdu[1].header['NAXIS2']
+            try:
+                hdu.index_of(('SCI',2))
+                full_uvis = hdu[0].header['detector'] == 'UVIS'
+            except KeyError:
+                full_uvis = False
+
+            if '_ima.fits' in fname:
+                exts = [(name,ver) for ver in range(1,hdu[0].header['NSAMP']+1) for name in ('SCI','ERR')]
+            else:
+                exts = [1, 2]
+
+            for ext in exts:
+                header = hdu[ext].header
+                if full_uvis:
+                    # UVIS2 (ext 1 and 2) is stacked below UVIS1 (ext 4 and 5)
+                    section = (0, naxis1, 0, naxis2*2)
+                    data = get_uvis_section(hdu, ext, ext+3, *section)
+                else:
+                    section = (0, naxis1, 0, naxis2)
+                    data = get_section(hdu, ext, *section)
+
+                if data is not None:
+                    get_zscale(data, get_scale_key(imagename, header, header.get('extver',1), *section))
+
+    if cache_file is not None:
+        with open(cache_file, 'w') as f:
+            json.dump(zscale_cache, f, indent=1)
+
+
+def get_preview_factor(ax, shape):
+    """ Get the integer factor that block reduces an image to the
+        resolution it is displayed at on an axis
+
+    Parameters
+    ----------
+    ax: Axes
+        The axis the image will be displayed on.
+
+    shape: (int,int)
+        The shape of the image.
+
+    Returns
+    -------
+    factor: Integer
+        The block size, 1 if the image is not larger than the axis.
+
+    """
+    # imshow keeps the pixels square, so the image is shrunk until both of
+    # its sides fit in the axis
+    bbox = ax.get_window_extent()
+    return int(max(1, shape[0]/bbox.height, shape[1]/bbox.width))
+
+
+def decimate(array, factor, extname):
+    """ Block reduce an image by an integer factor for a preview. The SCI
+        and ERR arrays are averaged over each block, and the DQ flags of
+        all the pixels of each block are combined with a bitwise OR so that
+        no flag is lost. Rows and columns that do not fill a whole block are
+        dropped.
+
+    Parameters
+    ----------
+    array : Array
+        The 2d array to reduce.
+
+    factor: Integer
+        The block size.
+
+    extname: String {"SCI", "ERR", "DQ"}
+        The name of the extension the array comes from.
+
+    Returns
+    -------
+    The reduced array
+
+    """
+    ny, nx = array.shape[0]//factor, array.shape[1]//factor
+    blocks = array[:ny*factor,:nx*factor].reshape(ny, factor, nx, factor)
+
+    if extname == 'DQ':
+        return np.bitwise_or.reduce(blocks, axis=(1,3))
+    return blocks.mean(axis=(1,3), dtype=np.float32)
+
+
+def get_dq_bits(dq_bits):
+    """ Get the columns of DQ_BIT_LUT of DQ flag values
+
+    Parameters
+    ----------
+    dq_bits: List
+        DQ flag values, powers of 2 from 1 to 32768.
+
+    Returns
+    -------
+    The bit numbers of the flags
+
+    """
+    if len(dq_bits) == 0:
+        raise ValueError("At least one DQ flag must be given")
+    columns = [int(bit).bit_length()-1 for bit in dq_bits]
+    if any(bit <= 0 or bit != 2**column for bit, column in zip(dq_bits, columns)) or max(columns) > 15:
+        raise ValueError(f"DQ flags must be powers of 2 from 1 to 32768, not {dq_bits}")
+    return columns
+
+
+def get_dq_planes(dq, dq_bits=None):
+    """ Decompose a DQ array into one boolean plane per flag, with a single
+        lookup of every DQ value in DQ_BIT_LUT
+
+    Parameters
+    ----------
+    dq: Array
+        The 2d array of data quality pixels ('DQ' array).
+
+    dq_bits: List
+        DQ flag values to decompose. Default is None, which gives all 16
+        flags, from 1 to 32768. The planes take one byte per pixel and flag,
+        so all 16 flags of a full frame UVIS image take about 270 MB; select
+        the flags of interest (e.g. those get_dq_counts finds) to save memory.
+
+    Returns
+    -------
+    planes: Array
+        ny x nx x len(dq_bits) boolean array, True where the pixel has the flag.
+
+    """
+    columns = range(16) if dq_bits is None else get_dq_bits(dq_bits)
+    return DQ_BIT_LUT[:,columns][dq.astype(np.uint16)]
+
+
+def get_dq_counts(dq, dq_bits=None):
+    """ Count the pixels flagged with each DQ flag, from the histogram of the
+        DQ values
+
+    Parameters
+    ----------
+    dq: Array
+        The 2d array of data quality pixels ('DQ' array).
+
+    dq_bits: List
+        DQ flag values to count. Default is None, which counts all 16 flags.
+
+    Returns
+    -------
+    counts: Dictionary
+        The number of pixels with each flag, keyed by flag value.
+
+    """
+    if dq_bits is None:
+        dq_bits = [2**bit for bit in range(16)]
+    histogram = np.bincount(dq.astype(np.uint16).ravel(), minlength=2**16)
+    counts = histogram @ DQ_BIT_LUT[:,get_dq_bits(dq_bits)]
+    return {bit: int(count) for bit, count in zip(dq_bits, counts)}
+
+
+def get_dq_colors(dq_bits):
+    """ Get the default overlay colors of DQ flags, those of the 'tab10'
+        colormap in turn
+
+    Parameters
+    ----------
+    dq_bits: List
+        DQ flag values.
+
+    Returns
+    -------
+    The list of colors
+
+    """
+    colors = plt.get_cmap('tab10').colors
+    return [colors[i % len(colors)] for i in range(len(dq_bits))]
+
+
+def make_dq_overlay(dq, dq_bits, colors=None, alpha=0.8):
+    """ Make an RGBA image of the pixels with the selected DQ flags, to draw
+        over the SCI array. Pixels with several of the flags take the color of
+        the first one listed, and pixels with none are transparent. The color
+        of every DQ value is precomputed, so the image is made with a single
+        lookup.
+
+    Parameters
+    ----------
+    dq: Array
+        The 2d array of data quality pixels ('DQ' array).
+
+    dq_bits: List
+        DQ flag values to show.
+
+    colors: List
+        Matplotlib colors of the flags. Default is None, see get_dq_colors().
+
+    alpha: float
+        Opacity of the flagged pixels.
+
+    Returns
+    -------
+    overlay: Array
+        ny x nx x 4 uint8 RGBA image.
+
+    """
+    if colors is None:
+        colors = get_dq_colors(dq_bits)
+
+    lut = np.zeros((2**16,4), dtype=np.uint8)
+    for column, color in reversed(list(zip(get_dq_bits(dq_bits), colors))):
+        lut[DQ_BIT_LUT[:,column]] = np.round(np.array(to_rgba(color, alpha))*255)
+    return lut[dq.astype(np.uint16)]
+
+
+def show_dq_overlay(ax, data_sci, data_dq, dq_bits, dq_counts, extent, cmap, vmin, vmax):
+    """ Draw the SCI array with the selected DQ flags overlaid in color and a
+        legend of the number of pixels with each flag
+
+    Parameters
+    ----------
+    ax: Axes
+        The axis to draw on.
+
+    data_sci: Array
+        The 2d array of science pixels ('SCI' array).
+
+    data_dq: Array
+        The 2d array of data quality pixels ('DQ' array), of the same shape.
+
+    dq_bits: List
+        DQ flag values to show.
+
+    dq_counts: Dictionary
+        The number of pixels with each flag, from get_dq_counts().
+
+    extent: (float,float,float,float)
+        The extent of the images.
+
+    cmap: String
+        The colormap of the SCI array.
+
+    vmin, vmax: float
+        The scale limits of the SCI array.
+
+    Returns
+    -------
+    overlay: AxesImage
+        The image of the DQ flags.
+
+    """
+    colors = get_dq_colors(dq_bits)
+    ax.imshow(data_sci,origin='lower',extent=extent,cmap=cmap,vmin=vmin,vmax=vmax)
+    overlay = ax.imshow(make_dq_overlay(data_dq, dq_bits, colors),origin='lower',extent=extent)
+    ax.legend(handles=[Patch(color=color, label=f"{bit}: {dq_counts[bit]}") for bit, color in zip(dq_bits, colors)],
+              title='DQ flag: pixels',loc='upper right',fontsize='small')
+    return overlay
+
+
 def make1x3plot(scaling, colormaps, fullsci, fullerr, fulldq,
                 xstart, xend, ystart, yend,
                 detector, fname, h1, h2, h3,
-                figsize, dpi):
+                figsize, dpi, preview=False, imagename=None, dq_bits=None):
     """ Make a 3 column figure to display any WFC3 image or image section
 
     Parameters
@@ -471,21 +1019,51 @@ def make1x3plot(scaling, colormaps, fullsci, fullerr, fulldq,
     dpi: float
         The resolution of the figure in dots-per-inch. Default is 100
 
+    preview: Bool
+        If True, block reduce the arrays to the resolution of the axes before
+        plotting them, see decimate(). Default is False
+
+    imagename: String
+        The name of the fits file, used to cache the zscale limits. Default is
+        None, which does not cache them.
+
+    dq_bits: List
+        DQ flag values, e.g. [16, 256], to overlay in color on the SCI array in
+        the DQ panel, with the number of pixels flagged with each of them, in
+        place of the DQ array. Default is None, which shows the DQ array.
+
     Returns
     -------
-    N/A
+    fig: Figure
+        The figure drawn.
 
     """
 
-    z1_sci, z2_sci = get_scale_limits(scaling[0],fullsci,'SCI')
-    z1_err, z2_err = get_scale_limits(scaling[1],fullerr,'ERR')
+    key_sci = get_scale_key(imagename, h1, h1.get('extver',1), xstart, xend, ystart, yend)
+    key_err = get_scale_key(imagename, h2, h2.get('extver',1), xstart, xend, ystart, yend)
+    z1_sci, z2_sci = get_scale_limits(scaling[0],fullsci,'SCI',key_sci)
+    z1_err, z2_err = get_scale_limits(scaling[1],fullerr,'ERR',key_err)
     z1_dq, z2_dq   = get_scale_limits(scaling[2],fulldq,'DQ')
+    if dq_bits is not None:
+        dq_counts = get_dq_counts(fulldq, dq_bits)
 
     fig, [ax1,ax2,ax3] = plt.subplots(1,3,figsize=figsize,dpi=dpi)
 
-    im1 = ax1.imshow(fullsci,origin='lower',extent=(xstart,xend,ystart,yend),cmap=colormaps[0],vmin=z1_sci, vmax=z2_sci)
-    im2 = ax2.imshow(fullerr,origin='lower',extent=(xstart,xend,ystart,yend),cmap=colormaps[1],vmin=z1_err, vmax=z2_err)
-    im3 = ax3.imshow(fulldq, origin='lower',extent=(xstart,xend,ystart,yend),cmap=colormaps[2],vmin=z1_dq, vmax=z2_dq)
+    extent = (xstart,xend,ystart,yend)
+    if preview:
+        factor = get_preview_factor(ax1, fullsci.shape)
+        if factor > 1:
+            fullsci = decimate(fullsci, factor, 'SCI')
+            fullerr = decimate(fullerr, factor, 'ERR')
+            fulldq = decimate(fulldq, factor, 'DQ')
+            extent = (xstart,xstart+fullsci.shape[1]*factor,ystart,ystart+fullsci.shape[0]*factor)
+
+    im1 = ax1.imshow(fullsci,origin='lower',extent=extent,cmap=colormaps[0],vmin=z1_sci, vmax=z2_sci)
+    im2 = ax2.imshow(fullerr,origin='lower',extent=extent,cmap=colormaps[1],vmin=z1_err, vmax=z2_err)
+    if dq_bits is None:
+        im3 = ax3.imshow(fulldq, origin='lower',extent=extent,cmap=colormaps[2],vmin=z1_dq, vmax=z2_dq)
+    else:
+        show_dq_overlay(ax3, fullsci, fulldq, dq_bits, dq_counts, extent, colormaps[0], z1_sci, z2_sci)
 
     if len(fname) > 18:
         ax1.set_title(f"WFC3/{detector} {fname}\n{h1['extname']} ext")
@@ -497,12 +1075,15 @@ def make1x3plot(scaling, colormaps, fullsci, fullerr, fulldq,
         ax3.set_title(f"WFC3/{detector} {fname} {h3['extname']} ext")
     fig.colorbar(im1, ax=ax1,shrink=.25,pad=.03)
     fig.colorbar(im2, ax=ax2,shrink=.25,pad=.03)
-    fig.colorbar(im3, ax=ax3,shrink=.25,pad=.03)
+    if dq_bits is None:
+        fig.colorbar(im3, ax=ax3,shrink=.25,pad=.03)
+
+    return fig
 
 def makeIR1x3plot(scaling, colormaps, data_sci, data_err, data_dq,
                   xstart, xend, ystart, yend,
                   detector, fname, h1, h2, h3, nsamps, ext,
-                  figsize, dpi):
+                  figsize, dpi, preview=False, imagename=None, dq_bits=None):
     """ Make a 3 column figure to display any WFC3 IMA image or image section
 
     Parameters
@@ -578,29 +1159,236 @@ def makeIR1x3plot(scaling, colormaps, data_sci, data_err, data_dq,
     dpi: float
         The resolution of the figure in dots-per-inch. Default is 100
 
+    preview: Bool
+        If True, block reduce the arrays to the resolution of the axes before
+        plotting them, see decimate(). Default is False
+
+    imagename: String
+        The name of the fits file, used to cache the zscale limits. Default is
+        None, which does not cache them.
+
+    dq_bits: List
+        DQ flag values, e.g. [16, 256], to overlay in color on the SCI array in
+        the DQ panel, with the number of pixels flagged with each of them, in
+        place of the DQ array. Default is None, which shows the DQ array.
+
     Returns
     -------
-    N/A
+    fig: Figure
+        The figure drawn.
 
     """
 
-    z1_sci, z2_sci = get_scale_limits(scaling[0],data_sci,'SCI')
-    z1_err, z2_err = get_scale_limits(scaling[1],data_err,'ERR')
+    key_sci = get_scale_key(imagename, h1, ext, xstart, xend, ystart, yend)
+    key_err = get_scale_key(imagename, h2, ext, xstart, xend, ystart, yend)
+    z1_sci, z2_sci = get_scale_limits(scaling[0],data_sci,'SCI',key_sci)
+    z1_err, z2_err = get_scale_limits(scaling[1],data_err,'ERR',key_err)
     z1_dq, z2_dq   = get_scale_limits(scaling[2],data_dq,'DQ')
+    if dq_bits is not None:
+        dq_counts = get_dq_counts(data_dq, dq_bits)
 
     fig, [ax1,ax2,ax3] = plt.subplots(1,3,figsize = figsize,dpi=dpi)
-    im1 = ax1.imshow(data_sci,origin='lower',extent=(xstart,xend,ystart,yend),cmap=colormaps[0],vmin=z1_sci, vmax=z2_sci)
-    im2 = ax2.imshow(data_err,origin='lower',extent=(xstart,xend,ystart,yend),cmap=colormaps[1],vmin=z1_err, vmax=z2_err)
-    im3 = ax3.imshow(data_dq, origin='lower',extent=(xstart,xend,ystart,yend),cmap=colormaps[2],vmin=z1_dq, vmax=z2_dq)
+
+    extent = (xstart,xend,ystart,yend)
+    if preview:
+        factor = get_preview_factor(ax1, data_sci.shape)
+        if factor > 1:
+            data_sci = decimate(data_sci, factor, 'SCI')
+            data_err = decimate(data_err, factor, 'ERR')
+            data_dq = decimate(data_dq, factor, 'DQ')
+            extent = (xstart,xstart+data_sci.shape[1]*factor,ystart,ystart+data_sci.shape[0]*factor)
+
+    im1 = ax1.imshow(data_sci,origin='lower',extent=extent,cmap=colormaps[0],vmin=z1_sci, vmax=z2_sci)
+    im2 = ax2.imshow(data_err,origin='lower',extent=extent,cmap=colormaps[1],vmin=z1_err, vmax=z2_err)
+    if dq_bits is None:
+        im3 = ax3.imshow(data_dq, origin='lower',extent=extent,cmap=colormaps[2],vmin=z1_dq, vmax=z2_dq)
+    else:
+        show_dq_overlay(ax3, data_sci, data_dq, dq_bits, dq_counts, extent, colormaps[0], z1_sci, z2_sci)
     fig.colorbar(im1, ax=ax1,shrink=.25,pad=.03)
     fig.colorbar(im2, ax=ax2,shrink=.25,pad=.03)
-    fig.colorbar(im3, ax=ax3,shrink=.25,pad=.03)
+    if dq_bits is None:
+        fig.colorbar(im3, ax=ax3,shrink=.25,pad=.03)
+
+    ax1.set_title(get_read_title(detector, fname, h1, nsamps, ext))
+    ax2.set_title(get_read_title(detector, fname, h2, nsamps, ext))
+    ax3.set_title(get_read_title(detector, fname, h3, nsamps, ext))
 
+    return fig
+
+def get_read_title(detector, fname, header, nsamps, ext):
+    """ Get the title of the panel of an IMA read
+
+    Parameters
+    ----------
+    detector: String {"UVIS", "IR"}
+        The detector used for the image
+
+    fname: String
+        The name of the file being plotted
+
+    header: Header
+        The header of the extension being displayed.
+
+    nsamps: Integer
+        The number of samples (readouts) contained in the file
+
+    ext: Integer
+        The extension to be displayed. Ranges from 1 to nsamp
+
+    Returns
+    -------
+    The title string
+
+    """
     if len(fname) > 18:
-        ax1.set_title(f"WFC3/{detector} {fname}\n  {h1['extname']} read {(nsamps+1)-ext}")
-        ax2.set_title(f"WFC3/{detector} {fname}\n  {h2['extname']} read {(nsamps+1)-ext}")
-        ax3.set_title(f"WFC3/{detector} {fname}\n  {h3['extname']} read {(nsamps+1)-ext}")
+        return f"WFC3/{detector} {fname}\n  {header['extname']} read {(nsamps+1)-ext}"
+    else:
+        return f"WFC3/{detector} {fname}  {header['extname']} read {(nsamps+1)-ext}"
+
+def animateIR1x3plot(scaling, colormaps, reads,
+                     xstart, xend, ystart, yend,
+                     detector, fname, h1, h2, h3, nsamps,
+                     figsize, dpi, preview=False, imagename=None, dq_bits=None,
+                     interval=500):
+    """ Animate the reads of a WFC3 IMA image or image section in a single 3
+        column figure. The figure is drawn once by makeIR1x3plot for the
+        first read, and each frame only replaces the image data, the scale
+        limits and the titles of the panels.
+
+    Parameters
+    ----------
+    scaling: List
+        List of real numbers to act as scalings for the SCI, ERR, and DQ arrays,
+        as for makeIR1x3plot. zscale limits are computed for each read.
+
+    colormaps: List
+        List of colormaps strings for the SCI, ERR, and DQ arrays.
+
+    reads: List
+        (ext, data_sci, data_err, data_dq) of each read, in the order they
+        are animated.
+
+    xstart, xend, ystart, yend: Integer
+        The pixel window of the arrays.
+
+    detector: String {"UVIS", "IR"}
+        The detector used for the image
+
+    fname: String
+        The name of the file being plotted
+
+    h1, h2, h3: Header
+        The extension 1, 2 and 3 headers of the fits file being displayed.
+
+    nsamps: Integer
+        The number of samples (readouts) contained in the file
+
+    figsize: (float,float)
+        The width, height of the figure.
+
+    dpi: float
+        The resolution of the figure in dots-per-inch.
+
+    preview: Bool
+        If True, block reduce the arrays to the resolution of the axes before
+        plotting them, see decimate(). Default is False
+
+    imagename: String
+        The name of the fits file, used to cache the zscale limits. Default is
+        None, which does not cache them.
+
+    dq_bits: List
+        DQ flag values to overlay on the SCI array in the DQ panel, as for
+        makeIR1x3plot. Default is None
+
+    interval: float
+        Delay between frames in milliseconds. Default is 500
+
+    Returns
+    -------
+    anim: FuncAnimation
+        The animation. Use save_animation() to write it to a file, or e.g.
+        IPython.display.HTML(anim.to_jshtml()) to play it in a notebook.
+
+    """
+    ext, data_sci, data_err, data_dq = reads[0]
+    fig = makeIR1x3plot(scaling, colormaps, data_sci, data_err, data_dq,
+                        xstart, xend, ystart, yend,
+                        detector, fname, h1, h2, h3, nsamps, ext,
+                        figsize, dpi, preview, imagename, dq_bits)
+    axes = fig.axes[:3]
+    images = [ax.images[0] for ax in axes]
+    headers = [h1, h2, h3]
+
+    # Block size makeIR1x3plot used for the previews
+    extent = images[0].get_extent()
+    factor = round((extent[1]-extent[0])/images[0].get_array().shape[1])
+
+    def update(frame):
+        ext, *arrays = reads[frame]
+        limits = []
+        for i, (ax, im, extname, data) in enumerate(zip(axes, images, EXTNAMES, arrays)):
+            key = get_scale_key(imagename, headers[i], ext, xstart, xend, ystart, yend) if extname != 'DQ' else None
+            limits.append(get_scale_limits(scaling[i],data,extname,key))
+            if extname == 'DQ' and dq_bits is not None:
+                dq_counts = get_dq_counts(data, dq_bits)
+            if factor > 1:
+                data = decimate(data, factor, extname)
+            if extname == 'DQ' and dq_bits is not None:
+                # The DQ panel shows the SCI array under the flags
+                im.set_data(images[0].get_array())
+                im.set_clim(*limits[0])
+                ax.images[1].set_data(make_dq_overlay(data, dq_bits))
+                for text, bit in zip(ax.get_legend().get_texts(), dq_bits):
+                    text.set_text(f"{bit}: {dq_counts[bit]}")
+            else:
+                im.set_data(data)
+                im.set_clim(*limits[i])
+            ax.set_title(get_read_title(detector, fname, headers[i], nsamps, ext))
+        return images
+
+    return animation.FuncAnimation(fig, update, frames=len(reads), interval=interval)
+
+class FrameWriter(animation.AbstractMovieWriter):
+    """ Animation writer that saves every frame to a png file of a directory,
+        frame_000.png, frame_001.png, ...
+    """
+    def setup(self, fig, outfile, dpi=None):
+        super().setup(fig, outfile, dpi)
+        os.makedirs(outfile, exist_ok=True)
+        self._frame = 0
+
+    def grab_frame(self, **savefig_kwargs):
+        self.fig.savefig(os.path.join(self.outfile, f"frame_{self._frame:03d}.png"), dpi=self.dpi, **savefig_kwargs)
+        self._frame += 1
+
+    def finish(self):
+        pass
+
+def save_animation(anim, output, fps=2):
+    """ Save an animation as a GIF, an MP4 movie or a sequence of frames
+
+    Parameters
+    ----------
+    anim: Animation
+        The animation, e.g. from animateIR1x3plot().
+
+    output: String
+        A file name ending in '.gif' or '.mp4' (which requires ffmpeg), or
+        the name of a directory to save each frame to as a png file.
+
+    fps: float
+        Frames per second of the GIF or MP4. Default is 2
+
+    Returns
+    -------
+    N/A
+
+    """
+    if output.endswith('.gif'):
+        writer = animation.PillowWriter(fps=fps)
+    elif output.endswith('.mp4'):
+        writer = animation.FFMpegWriter(fps=fps)
     else:
-        ax1.set_title(f"WFC3/{detector} {fname}  {h1['extname']} read {(nsamps+1)-ext}")
-        ax2.set_title(f"WFC3/{detector} {fname}  {h2['extname']} read {(nsamps+1)-ext}")
-        ax3.set_title(f"WFC3/{detector} {fname}  {h3['extname']} read {(nsamps+1)-ext}")
+        writer = FrameWriter(fps=fps)
+    anim.save(output, writer=writer)
@@ -0,0 +1,305 @@
+#! /usr/bin/env python
+
+""" Renders SCI/ERR/DQ thumbnails of many WFC3 fits images.
+
+This script draws every file with the three panel layout of
+``display_image`` (``make1x3plot``) at a fixed figure size, in preview
+mode, and saves it as a PNG or WebP image. Files without ERR and DQ
+data (e.g. raw files) are drawn as a single SCI panel. The files are
+rendered across a pool of worker processes; files that cannot be read
+or drawn are reported at the end instead of stopping the batch.
+
+By default each file gets its own zscale limits. With ``--global-scaling``
+the SCI and ERR panels of all the files with the same detector and
+brightness unit share the same limits, the median of the zscale limits of
+those files, so that a few outliers do not wash out the whole batch.
+
+Use
+---
+    This script is intended to be executed via the command line
+    as such:
+    ::
+
+        python make_thumbnails.py input [input ...] [-o|--output-dir] [-f|--format] [-g|--global-scaling] [-p|--processes]
+
+    ``input`` - fits files, or directories containing fits files.
+
+    ``-o --output-dir`` - Directory the thumbnails are written to.
+    Default is the current directory.
+
+    ``-f --format`` - ``png`` or ``webp``. Default is ``png``.
+
+    ``-g --global-scaling`` - Use the same SCI and ERR scale limits for
+    all the files with the same detector and brightness unit.
+
+    ``-p --processes`` - Number of worker processes. Default is the
+    number of CPUs.
+
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
+from glob import glob
+import os
+
+import numpy as np
+import matplotlib.pyplot as plt
+
+from display_image import get_zscale, read_full_frame
+from display_image import make1x3plot, makeSCIplot
+
+COLORMAPS = ['Greys_r','Greys_r','inferno_r']
+
+# 900x300 pixel thumbnails
+FIGSIZE = (9,3)
+DPI = 100
+
+
+def get_thumbnail_limits(imagename):
+    """ Get the zscale limits of the SCI and ERR arrays of a fits image.
+
+    Parameters
+    ----------
+    imagename: String
+        The name of the fits file.
+
+    Returns
+    -------
+    group: (String,String)
+        The detector and brightness unit of the image, which files must share
+        to be displayed with the same limits.
+
+    limits: List
+        The (z1, z2) limits of the SCI and ERR arrays, None for an ERR array
+        without data.
+
+    """
+    arrays, section, headers = read_full_frame(imagename)
+    group = (headers[0]['detector'], headers[1]['bunit'])
+    return group, [None if array is None else get_zscale(array) for array in arrays[:2]]
+
+
+def get_thumbnail_name(imagename, output_dir='.', fmt='png'):
+    """ Get the name of the thumbnail of a fits image
+
+    Parameters
+    ----------
+    imagename: String
+        The name of the fits file.
+
+    output_dir: String
+        The directory the thumbnail is written to.
+
+    fmt: String {"png", "webp"}
+        The image format of the thumbnail.
+
+    Returns
+    -------
+    The thumbnail file name, 'output_dir/file_thumb.png' for 'file.fits'
+
+    """
+    root = os.path.splitext(os.path.basename(imagename))[0]
+    return os.path.join(output_dir, f"{root}_thumb.{fmt}")
+
+
+def make_thumbnail(imagename, output_dir='.', fmt='png', scaling=[(None,None),(None,None),(None,None)]):
+    """ Render the SCI, ERR and DQ arrays of a fits image side by side, as
+        make1x3plot does, and save the figure.
+
+    Parameters
+    ----------
+    imagename: String
+        The name of the fits file.
+
+    output_dir: String
+        The directory the thumbnail is written to.
+
+    fmt: String {"png", "webp"}
+        The image format of the thumbnail.
+
+    scaling: List
+        The scale limits of the SCI, ERR, and DQ arrays, as for display_image.
+
+    Returns
+    -------
+    thumbnail: String
+        The name of the thumbnail file.
+
+    """
+    arrays, (xstart, xend, ystart, yend), (h, h1, h2, h3) = read_full_frame(imagename)
+    data_sci, data_err, data_dq = arrays
+    detector = h['detector']
+    fname = h['filename']
+
+    if data_err is not None and data_dq is not None:
+        fig = make1x3plot(scaling, COLORMAPS, data_sci, data_err, data_dq,
+                          xstart, xend, ystart, yend,
+                          detector, fname, h1, h2, h3,
+                          FIGSIZE, DPI, preview=True)
+    else:
+        fig = makeSCIplot(scaling, COLORMAPS, data_sci,
+                          xstart, xend, ystart, yend,
+                          detector, fname, h1,
+                          FIGSIZE, DPI, preview=True)
+
+    thumbnail = get_thumbnail_name(imagename, output_dir, fmt)
+    fig.savefig(thumbnail, dpi=DPI)
+    plt.close(fig)
+
+    return thumbnail
+
+
+def use_agg_backend():
+    """ Draw with the non-interactive Agg backend in the worker processes """
+    plt.switch_backend('Agg')
+
+
+def run_pool(function, items, processes):
+    """ Call a function on every item across a process pool.
+
+    Parameters
+    ----------
+    function: Function
+        The function, of a single file name.
+
+    items: List
+        The file names.
+
+    processes: Integer
+        Number of worker processes. None uses all the CPUs.
+
+    Returns
+    -------
+    results: Dictionary
+        The return value of the function for each file it succeeded on.
+
+    failures: Dictionary
+        The error message for each file it failed on.
+
+    """
+    results = {}
+    failures = {}
+    with ProcessPoolExecutor(max_workers=processes, initializer=use_agg_backend) as executor:
+        futures = {executor.submit(function, item): item for item in items}
+        for future in as_completed(futures):
+            try:
+                results[futures[future]] = future.result()
+            except Exception as e:
+                failures[futures[future]] = f"{type(e).__name__}: {e}"
+
+    return results, failures
+
+
+def make_thumbnails(filenames, output_dir='.', fmt='png', global_scaling=False, processes=None):
+    """ Render the SCI/ERR/DQ thumbnails of many fits images across a process
+        pool. Files that cannot be rendered are reported and skipped. Files
+        with the same name in different directories are rejected up front,
+        since their thumbnails would overwrite each other.
+
+    Parameters
+    ----------
+    filenames: List
+        The names of the fits files.
+
+    output_dir: String
+        The directory the thumbnails are written to.
+
+    fmt: String {"png", "webp"}
+        The image format of the thumbnails.
+
+    global_scaling: Bool
+        If True, the SCI and ERR arrays of all the files with the same
+        detector and brightness unit are displayed with the same limits: the
+        median of the lower and of the upper zscale limits of those files.
+        If False, each file gets its own zscale limits.
+
+    processes: Integer
+        Number of worker processes. Default is None, which uses all the CPUs.
+
+    Returns
+    -------
+    thumbnails: Dictionary
+        The thumbnail file name of each file that was rendered.
+
+    failures: Dictionary
+        The error message of each file that could not be rendered.
+
+    """
+    if fmt not in ('png', 'webp'):
+        raise ValueError(f"fmt must be 'png' or 'webp', not '{fmt}'")
+
+    # Render files listed more than once a single time, and reject files with
+    # the same name in different directories, which would overwrite each
+    # other's thumbnails
+    paths = set()
+    thumbnail_names = {}
+    for filename in filenames:
+        if os.path.abspath(filename) not in paths:
+            paths.add(os.path.abspath(filename))
+            thumbnail_names.setdefault(get_thumbnail_name(filename, output_dir, fmt), []).append(filename)
+    collisions = [names for names in thumbnail_names.values() if len(names) > 1]
+    if len(collisions) > 0:
+        raise ValueError(f"Files with the same name would share a thumbnail: {collisions}")
+    filenames = [names[0] for names in thumbnail_names.values()]
+    os.makedirs(output_dir, exist_ok=True)
+
+    failures = {}
+    if global_scaling:
+        limits, failures = run_pool(get_thumbnail_limits, filenames, processes)
+        groups = {}
+        for filename in filenames:
+            if filename in limits:
+                groups.setdefault(limits[filename][0], []).append(filename)
+    else:
+        groups = {None: filenames}
+
+    thumbnails = {}
+    for group, group_files in groups.items():
+        scaling = [(None,None),(None,None),(None,None)]
+        if global_scaling:
+            for i in (0,1):
+                group_limits = [limits[filename][1][i] for filename in group_files
+                                if limits[filename][1][i] is not None]
+                if len(group_limits) > 0:
+                    scaling[i] = tuple(float(z) for z in np.median(group_limits, axis=0))
+
+        render = partial(make_thumbnail, output_dir=output_dir, fmt=fmt, scaling=scaling)
+        group_thumbnails, render_failures = run_pool(render, group_files, processes)
+        thumbnails.update(group_thumbnails)
+        failures.update(render_failures)
+
+    for filename in sorted(failures):
+        print(f"Could not make a thumbnail of {filename}: {failures[filename]}")
+    print(f"Wrote {len(thumbnails)} of {len(thumbnails)+len(failures)} thumbnails to {output_dir}")
+
+    return thumbnails, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Render SCI/ERR/DQ thumbnails of WFC3 fits images.')
+    parser.add_argument('inputs', nargs='+',
+                        help='fits files, or directories containing fits files.')
+    parser.add_argument('-o', '--output-dir', default='.',
+                        help='Directory the thumbnails are written to.')
+    parser.add_argument('-f', '--format', default='png', choices=['png', 'webp'],
+                        help='Image format of the thumbnails.')
+    parser.add_argument('-g', '--global-scaling', action='store_true',
+                        help='Use the same SCI and ERR scale limits for all the files '
+                             'with the same detector and brightness unit.')
+    parser.add_argument('-p', '--processes', type=int, default=None,
+                        help='Number of worker processes. Default is the number of CPUs.')
+    args = parser.parse_args()
+
+    filenames = []
+    for item in args.inputs:
+        if os.path.isdir(item):
+            filenames += sorted(glob(os.path.join(item, '*.fits')))
+        else:
+            filenames.append(item)
+
+    make_thumbnails(filenames, output_dir=args.output_dir, fmt=args.format,
+                    global_scaling=args.global_scaling, processes=args.processes)
+
+
+if __name__ == '__main__':
+    main()
@@ -5,6 +5,7 @@ import numpy as np
 
 from astropy.io import fits
 import matplotlib.pyplot as plt
+from matplotlib import animation
 from scipy.stats import mode as mode
 
 def get_bunit(ext1header):
@@ -185,7 +186,8 @@ def make_ima_plot(xaxis, yaxis, axlabel, ylabel,
 
     Returns
     -------
-    N/A
+    fig: Figure
+        The figure drawn.
 
     """
     fig, ax1 = plt.subplots(1,1,figsize=figsize,dpi=dpi)
@@ -206,9 +208,89 @@ def make_ima_plot(xaxis, yaxis, axlabel, ylabel,
     if ylim != None:
         ax1.set_ylim(ylim[0],ylim[1])
 
+    return fig
+
+def animate_ima_plot(xaxis, reads, axlabel, ylabel,
+                     bunit, detector, fname, h1, ylim, nsamps,
+                     figsize, dpi, interval=500):
+    """ Animate the row or column statistics of the reads of a WFC3 IR IMA
+        image in a single figure. The figure is drawn once by make_ima_plot
+        for the first read, and each frame only replaces the y values of the
+        line and the title.
+
+    Parameters
+    ----------
+    xaxis: Range
+        Range from 1 to the total number of rows or columns. If image section
+        range will go from x1 to x2
+
+    reads: List
+        (ext, yaxis) of each read, in the order they are animated.
+
+    axlabel: String {"Row", "Column"}
+        The axis which the statistc was computed over
+
+    bunit: String
+        The string of the brightness unit for the axis label
+
+    detector: String {"UVIS", "IR"}
+        The detector used for the image
+
+    fname: String
+        The name of the file being plotted
+
+    h1: Header
+        The extension 1 header of the fits file being displayed.
+
+    ylim: (float,float)
+        The minimum and maximum values for y axis scale. The y axis is
+        rescaled to each read for limits that are None.
+
+    nsamps: Integer
+        The number of samples (readouts) contained in the file
+
+    figsize: (float,float)
+        The width, height of the figure.
+
+    dpi: float
+        The resolution of the figure in dots-per-inch.
+
+    interval: float
+        Delay between frames in milliseconds. Default is 500
+
+    Returns
+    -------
+    anim: FuncAnimation
+        The animation. Use display_image.save_animation() to write it to a
+        file, or e.g. IPython.display.HTML(anim.to_jshtml()) to play it in a
+        notebook.
+
+    """
+    ext, yaxis = reads[0]
+    fig = make_ima_plot(xaxis, yaxis, axlabel, ylabel,
+                        bunit, detector, fname, h1, ylim, nsamps, ext,
+                        figsize, dpi)
+    ax1 = fig.axes[0]
+    line = ax1.lines[0]
+
+    def update(frame):
+        ext, yaxis = reads[frame]
+        line.set_ydata(yaxis)
+        ax1.relim()
+        ax1.autoscale(axis='y')
+        if ylim != None:
+            ax1.set_ylim(ylim[0],ylim[1])
+        if len(fname) > 18:
+            ax1.set_title(f"WFC3/{detector} {fname}\n {h1['extname']} read {(nsamps+1)-ext}",size=14)
+        else:
+            ax1.set_title(f"WFC3/{detector} {fname} {h1['extname']} read {(nsamps+1)-ext}",size=14)
+        return [line]
+
+    return animation.FuncAnimation(fig, update, frames=len(reads), interval=interval)
+
 def row_column_stats(filename, stat='median', axis='column', ylim=(None,None),
                      printmeta=False, ima_multiread=False, plot=True,
-                     figsize=(9,6), dpi=120):
+                     figsize=(9,6), dpi=120, animate=False):
     """ A function to plot the column median vs column number for
         the 'SCI' data of any WFC3 fits image.
 
@@ -262,6 +344,12 @@ def row_column_stats(filename, stat='median', axis='column', ylim=(None,None),
         dpi: float
             The resolution of the figure in dots-per-inch. Default is 120
 
+        animate:  Bool
+           If animate, ima_multiread and plot are True the statistics of the
+           reads of the ima are shown one after the other in a single figure.
+           See display_image.save_animation() to save the animation as a GIF,
+           an MP4 or png frames.
+
         Returns
         -------
         xaxis: Range
@@ -270,6 +358,10 @@ def row_column_stats(filename, stat='median', axis='column', ylim=(None,None),
         yaxis: Array
            Array of y-axis row or column statistic values
 
+        anim: FuncAnimation
+           Only if animate, ima_multiread and plot are True, the animation of
+           the reads.
+
         """
 
     section_start = filename.find("[")
@@ -394,15 +486,23 @@ def row_column_stats(filename, stat='median', axis='column', ylim=(None,None),
 
     if detector == 'IR':
         if ima_multiread == True:
-            nsamps = fits.getheader(imagename)['NSAMP']
-            for ext in reversed(range(1,nsamps+1)):
-                with fits.open(imagename) as hdu:
-                    scidata = hdu['SCI',ext].data
+            nsamps = h['NSAMP']
+            reads = []
+            with fits.open(imagename, memmap=True) as hdu:
+                for ext in reversed(range(1,nsamps+1)):
+                    scidata = hdu['SCI',ext].section[ystart:yend,xstart:xend]
 
-                scidata = scidata[ystart:yend,xstart:xend]
+                    yaxis, ylabel = get_yaxis_and_label(stat,scidata,axes)
+                    reads.append((ext, yaxis))
 
-                yaxis, ylabel = get_yaxis_and_label(stat,scidata,axes)
-                if plot:
+            if plot and animate:
+                anim = animate_ima_plot(xaxis, reads, axlabel, ylabel,
+                                        bunit, detector, fname, h1, ylim,
+                                        nsamps, figsize, dpi)
+                return xaxis, yaxis, anim
+
+            if plot:
+                for ext, yaxis in reads:
                     make_ima_plot(xaxis, yaxis, axlabel, ylabel,
                                   bunit, detector, fname,h1, ylim,
                                   nsamps, ext, figsize, dpi)
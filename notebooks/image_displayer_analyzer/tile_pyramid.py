@@ -0,0 +1,361 @@
+#! /usr/bin/env python
+
+""" Multi-resolution tile pyramids of WFC3 images for interactive pan/zoom.
+
+A pyramid holds the full frame SCI, ERR and DQ arrays of a fits image (the
+two chips of full frame UVIS images stacked as in ``display_image``) at full
+resolution and at every factor of 2 below it, down to a single tile. SCI and
+ERR are block averaged and DQ is bitwise OR combined, as in the preview mode
+of ``display_image``. Every level is cut into square tiles stored one after
+the other in a ``.npy`` file, so that a tile is a contiguous block of the
+memory-mapped file.
+
+The pyramid of ``file.fits`` is written to the directory ``file_pyramid``
+next to it. ``display_pyramid`` draws the SCI/ERR/DQ panels from the level
+matching the zoom of the axes and only reads the tiles that are visible,
+fetching new tiles as the panels are panned and zoomed.
+
+Use
+---
+    This script is intended to be executed via the command line
+    as such:
+    ::
+
+        python tile_pyramid.py fits_file [fits_file ...] [-t|--tile-size]
+
+    ``fits_file`` - fits files to build the pyramids of.
+
+    ``-t --tile-size`` - Size in pixels of the side of the tiles. Default
+    is 256.
+
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+import matplotlib.pyplot as plt
+
+from display_image import EXTNAMES, decimate, get_preview_factor, get_scale_limits, read_full_frame
+
+
+def get_pyramid_dir(imagename):
+    """ Get the directory the pyramid of a fits file is stored in
+
+    Parameters
+    ----------
+    imagename: String
+        The name of the fits file.
+
+    Returns
+    -------
+    The name of the pyramid directory, 'file_pyramid' for 'file.fits'
+
+    """
+    return os.path.splitext(imagename)[0] + '_pyramid'
+
+
+def build_pyramid(imagename, tile_size=256):
+    """ Build the tile pyramid of the SCI, ERR and DQ arrays of a fits image
+        and write it next to the file. Extensions without data (e.g. the ERR
+        and DQ arrays of raw files) are left out.
+
+    Parameters
+    ----------
+    imagename: String
+        The name of the fits file.
+
+    tile_size: Integer
+        Size in pixels of the side of the tiles.
+
+    Returns
+    -------
+    pyramid_dir: String
+        The directory the pyramid was written to.
+
+    """
+    arrays, section, headers = read_full_frame(imagename)
+    pyramid_dir = get_pyramid_dir(imagename)
+    os.makedirs(pyramid_dir, exist_ok=True)
+
+    extnames = []
+    titles = []
+    for extname, array, header in zip(EXTNAMES, arrays, headers[1:]):
+        if array is None:
+            continue
+        extnames.append(extname)
+        titles.append(header['extname'])
+        shapes = []
+        level = 0
+        while True:
+            shapes.append(array.shape)
+            write_tiles(os.path.join(pyramid_dir, f"{extname}_{level}.npy"), array, tile_size)
+            if max(array.shape) <= tile_size:
+                break
+            # Repeat the last row and column of odd sized levels, so that
+            # every pixel falls in a 2x2 block of the next level
+            array = np.pad(array, ((0,array.shape[0]%2),(0,array.shape[1]%2)), mode='edge')
+            array = decimate(array, 2, extname)
+            level += 1
+
+    stat = os.stat(imagename)
+    metadata = {'filename': headers[0]['filename'],
+                'detector': headers[0]['detector'],
+                'extnames': extnames,
+                'titles': titles,
+                'section': section,
+                'tile_size': tile_size,
+                'shapes': shapes,
+                'mtime': stat.st_mtime,
+                'size': stat.st_size}
+    with open(os.path.join(pyramid_dir, 'pyramid.json'), 'w') as f:
+        json.dump(metadata, f, indent=1)
+
+    return pyramid_dir
+
+
+def write_tiles(tile_file, array, tile_size):
+    """ Cut an image into square tiles, padding its edges, and save them to a
+        .npy file with the shape (tile rows, tile columns, tile_size,
+        tile_size), which stores each tile contiguously.
+
+    Parameters
+    ----------
+    tile_file: String
+        The name of the .npy file.
+
+    array: Array
+        The 2d image.
+
+    tile_size: Integer
+        Size in pixels of the side of the tiles.
+
+    Returns
+    -------
+    N/A
+
+    """
+    ntiles_y = -(-array.shape[0]//tile_size)
+    ntiles_x = -(-array.shape[1]//tile_size)
+    array = np.pad(array, ((0,ntiles_y*tile_size-array.shape[0]),(0,ntiles_x*tile_size-array.shape[1])), mode='edge')
+
+    tiles = np.lib.format.open_memmap(tile_file, mode='w+', dtype=array.dtype.newbyteorder('='),
+                                      shape=(ntiles_y,ntiles_x,tile_size,tile_size))
+    tiles[...] = array.reshape(ntiles_y,tile_size,ntiles_x,tile_size).transpose(0,2,1,3)
+    tiles.flush()
+    del tiles
+
+
+def open_pyramid(imagename, build=True, tile_size=256):
+    """ Open the tile pyramid of a fits image, building it if it does not
+        exist or is older than the fits file.
+
+    Parameters
+    ----------
+    imagename: String
+        The name of the fits file.
+
+    build: Bool
+        If False, raise a ValueError instead of building a missing or out of
+        date pyramid.
+
+    tile_size: Integer
+        Size in pixels of the side of the tiles of a pyramid that is built.
+
+    Returns
+    -------
+    pyramid: Dictionary
+        The metadata of the pyramid, with the memory-mapped tiles of every
+        level of each extension under 'tiles', e.g. pyramid['tiles']['SCI'][0]
+        for the full resolution SCI tiles.
+
+    """
+    pyramid_dir = get_pyramid_dir(imagename)
+    metadata_file = os.path.join(pyramid_dir, 'pyramid.json')
+
+    stat = os.stat(imagename)
+    pyramid = None
+    if os.path.exists(metadata_file):
+        with open(metadata_file) as f:
+            pyramid = json.load(f)
+        if pyramid['mtime'] != stat.st_mtime or pyramid['size'] != stat.st_size:
+            pyramid = None
+
+    if pyramid is None:
+        if not build:
+            raise ValueError(f"{imagename} has no up to date pyramid in {pyramid_dir}")
+        build_pyramid(imagename, tile_size)
+        with open(metadata_file) as f:
+            pyramid = json.load(f)
+
+    pyramid['tiles'] = {extname: [np.load(os.path.join(pyramid_dir, f"{extname}_{level}.npy"), mmap_mode='r')
+                                  for level in range(len(pyramid['shapes']))]
+                        for extname in pyramid['extnames']}
+    return pyramid
+
+
+def get_pyramid_view(pyramid, extname, level, xstart, xend, ystart, yend):
+    """ Assemble the part of a pyramid level that covers a pixel window from
+        the tiles that overlap it. Only those tiles are read from disk.
+
+    Parameters
+    ----------
+    pyramid: Dictionary
+        The pyramid, as returned by open_pyramid.
+
+    extname: String {"SCI", "ERR", "DQ"}
+        The extension to read.
+
+    level: Integer
+        The pyramid level, whose pixels are 2**level full resolution pixels
+        on a side.
+
+    xstart, xend, ystart, yend: Integer
+        The pixel window, in full resolution pixels.
+
+    Returns
+    -------
+    view: Array
+        The pixels of the level covering the window.
+
+    extent: (int,int,int,int)
+        The window covered by view, in full resolution pixels, for imshow.
+
+    """
+    tile_size = pyramid['tile_size']
+    ny, nx = pyramid['shapes'][level]
+    scale = 2**level
+
+    # Window in pixels of the level, clipped to the image
+    x0 = min(max(xstart//scale, 0), nx-1)
+    y0 = min(max(ystart//scale, 0), ny-1)
+    x1 = min(max(-(-xend//scale), x0+1), nx)
+    y1 = min(max(-(-yend//scale), y0+1), ny)
+
+    tx0, tx1 = x0//tile_size, (x1-1)//tile_size + 1
+    ty0, ty1 = y0//tile_size, (y1-1)//tile_size + 1
+    tiles = pyramid['tiles'][extname][level][ty0:ty1,tx0:tx1]
+    mosaic = tiles.transpose(0,2,1,3).reshape((ty1-ty0)*tile_size, (tx1-tx0)*tile_size)
+
+    view = mosaic[y0-ty0*tile_size:y1-ty0*tile_size, x0-tx0*tile_size:x1-tx0*tile_size]
+    extent = (x0*scale, x1*scale, y0*scale, y1*scale)
+    return view, extent
+
+
+def get_pyramid_level(pyramid, ax, xstart, xend, ystart, yend):
+    """ Get the coarsest pyramid level that still has at least one pixel per
+        display pixel for a window shown on an axis
+
+    Parameters
+    ----------
+    pyramid: Dictionary
+        The pyramid, as returned by open_pyramid.
+
+    ax: Axes
+        The axis the window is displayed on.
+
+    xstart, xend, ystart, yend: Integer
+        The pixel window, in full resolution pixels.
+
+    Returns
+    -------
+    level: Integer
+        The pyramid level.
+
+    """
+    factor = get_preview_factor(ax, (yend-ystart, xend-xstart))
+    return min(int(np.log2(factor)), len(pyramid['shapes'])-1)
+
+
+def display_pyramid(imagename,
+                    colormaps=['Greys_r','Greys_r','inferno_r'],
+                    scaling=[(None,None),(None,None),(None,None)],
+                    figsize=(18,6),
+                    dpi=100,
+                    build=True):
+    """ Display the SCI, ERR and DQ arrays of a fits image from its tile
+        pyramid. The three panels share their axes, and when they are panned
+        or zoomed the visible tiles of the level matching the new zoom are
+        read and drawn. Use an interactive matplotlib backend (e.g. %matplotlib
+        widget in Jupyter) to pan and zoom.
+
+    Parameters
+    ----------
+    imagename: String
+        The name of the fits file.
+
+    colormaps: List
+        List of colormaps strings for the SCI, ERR, and DQ arrays, as for
+        display_image.
+
+    scaling: List
+        The scale limits of the SCI, ERR, and DQ arrays, as for display_image.
+        zscale limits are computed on the coarsest level of the pyramid.
+
+    figsize: (float,float)
+        The width, height of the figure. Default is (18,6)
+
+    dpi: float
+        The resolution of the figure in dots-per-inch. Default is 100
+
+    build: Bool
+        If True, build the pyramid if it does not exist or is out of date.
+
+    Returns
+    -------
+    fig: Figure
+        The figure drawn.
+
+    """
+    pyramid = open_pyramid(imagename, build=build)
+    extnames = pyramid['extnames']
+    xstart, xend, ystart, yend = pyramid['section']
+    top = len(pyramid['shapes'])-1
+
+    fig, axes = plt.subplots(1,len(extnames),figsize=figsize,dpi=dpi,sharex=True,sharey=True,squeeze=False)
+    axes = axes[0]
+
+    level = get_pyramid_level(pyramid, axes[0], xstart, xend, ystart, yend)
+    images = []
+    for i, (ax, extname) in enumerate(zip(axes, extnames)):
+        # The single tile of the top level is padded beyond the image
+        ny, nx = pyramid['shapes'][top]
+        z1, z2 = get_scale_limits(scaling[i], pyramid['tiles'][extname][top][0,0][:ny,:nx], extname)
+        view, extent = get_pyramid_view(pyramid, extname, level, xstart, xend, ystart, yend)
+        im = ax.imshow(view,origin='lower',extent=extent,cmap=colormaps[i],vmin=z1,vmax=z2)
+        ax.set_title(f"WFC3/{pyramid['detector']} {pyramid['filename']} {pyramid['titles'][i]} ext")
+        fig.colorbar(im, ax=ax,shrink=.75,pad=.03)
+        images.append(im)
+    axes[0].set_xlim(xstart, xend)
+    axes[0].set_ylim(ystart, yend)
+    axes[0].set_autoscale_on(False)
+
+    def update(ax):
+        x1, x2 = sorted(ax.get_xlim())
+        y1, y2 = sorted(ax.get_ylim())
+        window = (int(np.floor(x1)), int(np.ceil(x2)), int(np.floor(y1)), int(np.ceil(y2)))
+        level = get_pyramid_level(pyramid, ax, *window)
+        for im, extname in zip(images, extnames):
+            view, extent = get_pyramid_view(pyramid, extname, level, *window)
+            im.set_data(view)
+            im.set_extent(extent)
+
+    axes[0].callbacks.connect('xlim_changed', update)
+    axes[0].callbacks.connect('ylim_changed', update)
+
+    return fig
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the tile pyramids of WFC3 fits images.')
+    parser.add_argument('fits_files', nargs='+', help='fits files to build the pyramids of.')
+    parser.add_argument('-t', '--tile-size', type=int, default=256,
+                        help='Size in pixels of the side of the tiles. Default is 256.')
+    args = parser.parse_args()
+
+    for imagename in args.fits_files:
+        print(f"Wrote {build_pyramid(imagename, args.tile_size)}")
+
+
+if __name__ == '__main__':
+    main()
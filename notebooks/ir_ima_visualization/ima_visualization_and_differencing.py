@@ -1,91 +1,1262 @@
+import hashlib
 import os
+import tempfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
+
 import numpy as np
 from astropy.io import fits
-import matplotlib.pyplot as plt
-from ginga.util.zscale import zscale
-import matplotlib.patheffects as path_effects
 
-def read_wfc3(filename):
+# matplotlib, ginga and astropy.table are imported by the functions that use them, so that
+# batch workers running only the numerical functions start without importing them
+
+# Full frame, clipped by 5 pixels around the border to exclude any bad pixel regions
+FULL_FRAME_REGION = {"x0":5, "x1":-5, "y0":5, "y1":-5}
+
+# Default left and right hand side regions used to look for background gradients
+LHS_REGION = {"x0":50, "x1":250, "y0":100, "y1":900}
+RHS_REGION = {"x0":700, "x1":900, "y0":100, "y1":900}
+
+def read_wfc3_cube(filename, mmap_file=None):
+    '''
+    Read a full-frame IR image into a C-contiguous NSAMPx1024x1024 float32 datacube plus 
+    integration times for each read. The reads are written straight into their time-ordered 
+    position, so no reversed copy of the cube is made, and the integration times are read 
+    from the TIME extension headers only.
+
+    Parameters
+    ----------
+    filename : str
+        Path to a full-frame IR IMA image fits file.
+
+    mmap_file : str, optional
+        Path to a .npy file backing the datacube. If it is newer than the fits file, the 
+        cube is memory-mapped from it read-only and only the reads that are accessed are 
+        loaded. Otherwise it is (re)written from the fits file. Default is None, which 
+        loads the cube into memory.
+
+    Returns
+    -------
+    cube : array-like
+        NSAMPx1024x1024 float32 datacube of the IR image in ascending time order, 
+        where NSAMP is the number of samples taken.
+  
+    integ_time : array-like
+        Integration times associated with the datacube in ascending order.    
+    '''
+    
+    with fits.open(filename, memmap = True) as f:
+        NSAMP = f[0].header['NSAMP']
+        hdr1 = f[1].header
+        shape = (NSAMP, hdr1['NAXIS2'], hdr1['NAXIS1'])
+
+        # SCI 1 is the last read, so extension i goes in position NSAMP-i of the cube
+        integ_time = np.array([f[('TIME', i)].header['PIXVALUE'] for i in range(NSAMP, 0, -1)])
+
+        if mmap_file is not None and os.path.exists(mmap_file) \
+           and os.path.getmtime(mmap_file) >= os.path.getmtime(filename):
+            cube = np.load(mmap_file, mmap_mode = 'r')
+            if cube.shape == shape and cube.dtype == np.float32:
+                return cube, integ_time
+
+        if mmap_file is not None:
+            cube = np.lib.format.open_memmap(mmap_file, mode = 'w+', dtype = np.float32, shape = shape)
+        else:
+            cube = np.empty(shape, dtype = np.float32)
+
+        for i in range(1, NSAMP+1):
+            cube[NSAMP-i] = f[('SCI', i)].data
+
+    if mmap_file is not None:
+        cube.flush()
+
+    return cube, integ_time
+
+
+def read_wfc3(filename):
+    '''
+    Read a full-frame IR image and return the datacube plus integration times for each read.
+    Requires the path to a RAW full-frame IR image fits file (filename). The datacube is a 
+    new float64 array, so it can be modified freely; use read_wfc3_cube for the float32 cube.
+
+    Parameters
+    ----------
+    filename : str
+        Path to a RAW full-frame IR image fits file.
+
+    Returns
+    -------
+    cube : array-like
+        1024x1024xNSAMP float64 datacube of the IR image in ascending time order, 
+        where NSAMP is the number of samples taken.
+  
+    integ_time : array-like
+        Integration times associated with the datacube in ascending order.    
+    '''
+    
+    cube, integ_time = read_wfc3_cube(filename)
+
+    return cube.transpose(1, 2, 0).astype(np.float64), integ_time
+
+
+
+def compute_diff_imas(cube, integ_time, diff_method, out = None, dtype = None, chunk_rows = None):
+    
+    '''
+    Compute the difference in signal between reads of a WFC3 IR IMA file.
+    The differences are evaluated with in-place ufuncs, one read at a time, so no temporary 
+    cube is allocated besides the output. 
+    
+    Parameters
+    ----------
+    cube : array-like
+       1024x1024xNSAMP datacube of the IR image in ascending time order, 
+       where NSAMP is the number of samples taken.
+
+    integ_time : array-like
+       Integration times associated with the datacube in ascending order.
+
+    diff_method: str
+       The method of finding the difference between reads. 
+       Either "instantaneous" or "cumulative".
+
+    out : array-like, optional
+       1024x1024x(NSAMP-1) array the differences are written to. Default is None, which 
+       allocates it with the reads contiguous in memory, like the cubes of read_wfc3_cube.
+
+    dtype : data-type, optional
+       Data type of the differences when out is not given. Default is None, which uses the
+       data type of the cube for cumulative differences, and float64 for instantaneous ones.
+
+    chunk_rows : int, optional
+       Number of rows differenced at a time, e.g. to stream through a memory-mapped cube. 
+       Default is None, which differences all the rows at once.
+           
+    Returns
+    --------
+    diff : array-like
+        1024x1024x(NSAMP-1) datacube of the differebce between IR IMA reads in ascending time order, 
+        where NSAMP is the number of samples taken.
+    '''
+    
+    if diff_method not in ('instantaneous', 'cumulative'): # if an incorrect method is chosen raise an error
+        raise ValueError(f"{diff_method} is an invalid method. The allowed methods are 'instantaneous' and 'cumulative'.")
+
+    ny, nx, nsamp = cube.shape
+    if out is None:
+        if dtype is None:
+            dtype = cube.dtype if diff_method == 'cumulative' else np.result_type(cube.dtype, np.float64)
+        out = np.empty((nsamp - 1, ny, nx), dtype = dtype).transpose(1, 2, 0)
+    elif out.shape != (ny, nx, nsamp - 1):
+        raise ValueError(f"out must have shape {(ny, nx, nsamp - 1)}, not {out.shape}.")
+    diff = out
+
+    if chunk_rows is None:
+        chunk_rows = ny
+
+    if diff_method == 'instantaneous':
+        # diff_j = (ima_j*(t_j-t_0) - ima_j_1*(t_j_1-t_0))/(t_j-t_j_1), evaluated in this order 
+        # so that the float64 differences are identical to the whole-cube expression
+        t_0 = integ_time[0]
+        t_j = np.asarray(integ_time[1:], dtype = float)
+        t_j_1 = np.asarray(integ_time[0:-1], dtype = float)
+
+    for y0 in range(0, ny, chunk_rows):
+        rows = slice(y0, min(y0 + chunk_rows, ny))
+        diff_rows = diff[rows]
+        
+        if diff_method == 'instantaneous':
+            scratch = np.empty(diff_rows.shape[:2], dtype = diff.dtype)
+            for j in range(nsamp - 1):
+                np.multiply(cube[rows, :, j+1], t_j[j]-t_0, out = diff_rows[:, :, j], dtype = diff.dtype)
+                np.multiply(cube[rows, :, j], t_j_1[j]-t_0, out = scratch, dtype = diff.dtype)
+                diff_rows[:, :, j] -= scratch
+                diff_rows[:, :, j] /= t_j[j]-t_j_1[j]
+            
+        else:
+            np.subtract(cube[rows, :, 0:-1], cube[rows, :, 1:], out = diff_rows, dtype = diff.dtype)
+
+    return diff
+
+
+def fit_ramp(cube, integ_time, exclude_reads = None, read_noise = 20., jump_threshold = 4., 
+             max_jumps = 2, chunk_rows = 128):
+    '''
+    Fit the count rate of every pixel of a WFC3 IR IMA datacube up the ramp, by weighted 
+    least squares on the accumulated counts of all the reads, with cosmic-ray jump detection.
+    The interval ending at an excluded read or at a jump is dropped from the fit by starting
+    a new ramp segment there, and all the segments of a pixel share the fitted rate. This 
+    removes the excess signal of bad reads (e.g. scattered light or time-variable background)
+    from the rate without subtracting whole reads.
+
+    All the pixels are fitted at once, chunk_rows rows at a time to bound the memory used.
+
+    Parameters
+    ----------
+    cube : array-like
+       1024x1024xNSAMP datacube of the IR image in ascending time order, in e-/s, 
+       where NSAMP is the number of samples taken.
+
+    integ_time : array-like
+       Integration times associated with the datacube in ascending order.
+
+    exclude_reads : list of int
+       IMSETs of the reads to exclude from the fit for every pixel. Default is None.
+
+    read_noise : float
+       Read noise of a single read in electrons, used for the weights and jump detection.
+
+    jump_threshold : float
+       A read whose difference from the previous read exceeds the fitted rate by more than 
+       this many sigma is flagged as a jump.
+
+    max_jumps : int
+       Maximum number of jumps flagged per pixel.
+
+    chunk_rows : int
+       Number of rows fitted at a time.
+
+    Returns
+    -------
+    rate : array-like
+        1024x1024 float32 count rate in e-/s. Pixels without any usable interval are NaN.
+
+    error : array-like
+        1024x1024 float32 uncertainty of the count rate in e-/s.
+
+    read_mask : array-like
+        1024x1024xNSAMP boolean array, True where the interval ending at a read was dropped 
+        from the fit, either because the read was excluded or because of a jump.
+    '''
+
+    ny, nx, nsamp = cube.shape
+    t = np.asarray(integ_time, dtype = float) - integ_time[0]
+    dt = np.diff(t)[:, None, None]
+
+    read_mask = np.zeros((ny, nx, nsamp), dtype = bool)
+    if exclude_reads is not None:
+        imsets = np.atleast_1d(exclude_reads)
+        if np.any((imsets < 1) | (imsets >= nsamp)):
+            raise ValueError(f"Reads to exclude must be IMSETs between 1 and {nsamp-1}, got {exclude_reads}.")
+        read_mask[:, :, nsamp - imsets] = True
+
+    rate = np.empty((ny, nx), dtype = np.float32)
+    error = np.empty((ny, nx), dtype = np.float32)
+
+    for y0 in range(0, ny, chunk_rows):
+        rows = slice(y0, min(y0 + chunk_rows, ny))
+
+        # Accumulated counts of each read relative to the zeroth read, (NSAMP, rows, x)
+        counts = cube[rows].transpose(2, 0, 1) * t[:, None, None]
+        mask = read_mask[rows].transpose(2, 0, 1)
+        diff_counts = np.diff(counts, axis = 0)
+
+        # Weight the reads by their read noise plus the Poisson noise of a robust first guess 
+        # at the rate, the median rate of the individual intervals
+        with np.errstate(invalid = 'ignore'):
+            rate_guess = np.nanmedian(np.where(mask[1:], np.nan, diff_counts/dt), axis = 0)
+        rate_guess = np.nan_to_num(np.maximum(rate_guess, 0))
+        weights = 1./(read_noise**2 + rate_guess*t[:, None, None])
+
+        for n_jumps in range(max_jumps + 1):
+            chunk_rate, chunk_error = fit_ramp_segments(counts, t, weights, mask, read_noise)
+            if n_jumps == max_jumps:
+                break
+
+            # Flag the interval most above the fitted rate in each pixel, if it is a jump
+            with np.errstate(invalid = 'ignore'):
+                z = (diff_counts - chunk_rate*dt)/np.sqrt(2*read_noise**2 + np.maximum(chunk_rate, 0)*dt)
+            z[mask[1:] | np.isnan(z)] = -np.inf
+            worst = np.argmax(z, axis = 0)
+            jump_y, jump_x = np.nonzero(np.take_along_axis(z, worst[None], axis = 0)[0] > jump_threshold)
+            if len(jump_y) == 0:
+                break
+            mask[worst[jump_y, jump_x] + 1, jump_y, jump_x] = True
+
+        rate[rows] = chunk_rate
+        error[rows] = chunk_error
+
+    return rate, error, read_mask
+
+
+def fit_ramp_segments(counts, t, weights, mask, read_noise):
+    '''
+    Weighted least squares fit of a common slope to the ramp segments of every pixel, used by 
+    fit_ramp. A new segment, with its own intercept, starts at every masked read.
+
+    Parameters
+    ----------
+    counts : array-like
+       NSAMPxNYxNX accumulated counts of each read in ascending time order.
+
+    t : array-like
+       Time of each read since the zeroth read.
+
+    weights : array-like
+       NSAMPxNYxNX (or broadcastable) weight of the counts of each read.
+
+    mask : array-like
+       NSAMPxNYxNX boolean array, True where a new segment starts.
+
+    read_noise : float
+       Read noise of a single read in electrons.
+
+    Returns
+    -------
+    rate : array-like
+        NYxNX fitted slope. Pixels with no segment of two or more reads are NaN.
+
+    error : array-like
+        NYxNX uncertainty of the fitted slope, from the read noise of every read and the 
+        Poisson noise of the fitted rate, which is correlated between reads.
+    '''
+
+    nsamp, shape = counts.shape[0], counts.shape[1:]
+    weights = np.broadcast_to(weights, counts.shape)
+
+    sxx_total = np.zeros(shape)
+    sxy_total = np.zeros(shape)
+    s, sx, sy, sxx, sxy = [np.zeros(shape) for i in range(5)]
+    # Running weight and weighted time of the segment up to each read
+    s_run = np.empty(counts.shape)
+    sx_run = np.empty(counts.shape)
+
+    def close_segments(where):
+        # Add the centred sums of the segments that end here to the totals, and reset them
+        with np.errstate(invalid = 'ignore', divide = 'ignore'):
+            sxx_total[where] += (sxx - sx**2/s)[where]
+            sxy_total[where] += (sxy - sx*sy/s)[where]
+        for sums in (s, sx, sy, sxx, sxy):
+            sums[where] = 0
+
+    for j in range(nsamp):
+        if j > 0:
+            close_segments(mask[j])
+        wt = weights[j]*t[j]
+        s += weights[j]
+        sx += wt
+        sy += weights[j]*counts[j]
+        sxx += wt*t[j]
+        sxy += wt*counts[j]
+        s_run[j] = s
+        sx_run[j] = sx
+    close_segments(np.ones(shape, dtype = bool))
+
+    # The slope is sum_j a_j counts_j, with a_j = w_j (t_j - tbar)/sxx_total and tbar the 
+    # weighted mean time of the segment of read j. Read noise adds read_noise^2 a_j^2, and the 
+    # Poisson noise of the interval ending at read j adds rate dt_j A_j^2, where A_j is the 
+    # sum of a from read j to the end of its segment (the a of every segment sum to zero).
+    var_read = np.zeros(shape)
+    var_poisson = np.zeros(shape)
+    seg_s = s_run[-1].copy()
+    seg_sx = sx_run[-1].copy()
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        for j in range(nsamp - 1, -1, -1):
+            if j < nsamp - 1:
+                ends = mask[j+1]
+                seg_s[ends] = s_run[j][ends]
+                seg_sx[ends] = sx_run[j][ends]
+            tbar = seg_sx/seg_s
+            var_read += (weights[j]*(t[j] - tbar))**2
+            if j > 0:
+                a_sum = (seg_sx - sx_run[j-1]) - tbar*(seg_s - s_run[j-1])
+                var_poisson += np.where(mask[j], 0, (t[j] - t[j-1])*a_sum**2)
+
+        rate = sxy_total/sxx_total
+        error = np.sqrt(read_noise**2*var_read + np.maximum(rate, 0)*var_poisson)/sxx_total
+    rate[sxx_total <= 0] = np.nan
+    error[sxx_total <= 0] = np.nan
+
+    return rate, error
+
+
+def get_ramp_residual_map(cube, integ_time, read_noise = 20., chunk_rows = 128):
+    '''
+    Map how far the ramp of every pixel departs from a straight line, to localize anomalies 
+    such as satellite trails, scattered light gradients or persistence that region medians 
+    average away. A linear ramp is fitted to every pixel as in fit_ramp, without excluding any 
+    read, and the signal accumulated between each pair of reads is compared to the fitted rate,
+    in units of its expected noise. All the pixels are computed at once, chunk_rows rows at a time.
+
+    Parameters
+    ----------
+    cube : array-like
+       1024x1024xNSAMP datacube of the IR image in ascending time order, in e-/s, 
+       where NSAMP is the number of samples taken.
+
+    integ_time : array-like
+       Integration times associated with the datacube in ascending order.
+
+    read_noise : float
+       Read noise of a single read in electrons.
+
+    chunk_rows : int
+       Number of rows computed at a time.
+
+    Returns
+    -------
+    chi2 : array-like
+        1024x1024 reduced chi-square of the read differences about the linear ramp.
+
+    max_deviation : array-like
+        1024x1024 signed deviation, in sigma, of the read difference furthest from the ramp.
+
+    worst_read : array-like
+        1024x1024 IMSET of the read ending the read difference furthest from the ramp.
+    '''
+
+    ny, nx, nsamp = cube.shape
+    t = np.asarray(integ_time, dtype = float) - integ_time[0]
+    dt = np.diff(t)[:, None, None]
+
+    chi2 = np.empty((ny, nx), dtype = np.float32)
+    max_deviation = np.empty((ny, nx), dtype = np.float32)
+    worst_read = np.empty((ny, nx), dtype = np.int16)
+
+    for y0 in range(0, ny, chunk_rows):
+        rows = slice(y0, min(y0 + chunk_rows, ny))
+        counts = cube[rows].transpose(2, 0, 1) * t[:, None, None]
+        diff_counts = np.diff(counts, axis = 0)
+        no_break = np.zeros(counts.shape, dtype = bool)
+
+        rate_guess = np.nan_to_num(np.maximum(np.median(diff_counts/dt, axis = 0), 0))
+        weights = 1./(read_noise**2 + rate_guess*t[:, None, None])
+        rate, error = fit_ramp_segments(counts, t, weights, no_break, read_noise)
+
+        with np.errstate(invalid = 'ignore'):
+            z = (diff_counts - rate*dt)/np.sqrt(2*read_noise**2 + np.maximum(rate, 0)*dt)
+        worst = np.argmax(np.abs(z), axis = 0)
+
+        chi2[rows] = np.sum(z*z, axis = 0)/max(nsamp - 2, 1)
+        max_deviation[rows] = np.take_along_axis(z, worst[None], axis = 0)[0]
+        worst_read[rows] = nsamp - 1 - worst
+
+    return chi2, max_deviation, worst_read
+
+
+class CubeCache(object):
+
+    def __init__(self, max_bytes = 2*1024**3):
+        '''
+        Memory-bounded cache of IMA datacubes and difference cubes, keyed by file path, 
+        modification time and difference method, that evicts the least recently used cubes 
+        first. The cached cubes are read-only, so copy them before modifying them.
+
+        Parameters
+        ----------
+        max_bytes : int
+            Largest total size of the cached cubes, in bytes. Default is 2 GB.
+        '''
+
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get(self, filename, diff_method = None):
+        '''
+        Return the datacube and integration times of an IMA file, or its difference cube if 
+        a difference method is given, loading and caching them on a miss.
+
+        Parameters
+        ----------
+        filename : str
+            Path to a full-frame IR IMA image fits file.
+
+        diff_method: str
+            The method of finding the difference between reads, 
+            either "instantaneous" or "cumulative". Default is None, for the datacube itself.
+
+        Returns
+        -------
+        cube : array-like
+            Read-only 1024x1024xNSAMP datacube, or 1024x1024x(NSAMP-1) difference cube, 
+            in ascending time order.
+
+        integ_time : array-like
+            Integration times associated with the datacube in ascending order.
+        '''
+
+        key = (os.path.abspath(filename), os.path.getmtime(filename), diff_method)
+        if key in self._entries:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+        self.misses += 1
+        if diff_method is None:
+            cube, integ_time = read_wfc3_cube(filename)
+            cube = cube.transpose(1, 2, 0)
+        else:
+            cube, integ_time = self.get(filename)
+            cube = compute_diff_imas(cube, integ_time, diff_method = diff_method, dtype = np.float32)
+        cube.setflags(write = False)
+
+        self._entries[key] = (cube, integ_time)
+        self.nbytes += cube.nbytes
+        while self.nbytes > self.max_bytes and len(self._entries) > 1:
+            _, (evicted, _) = self._entries.popitem(last = False)
+            self.nbytes -= evicted.nbytes
+
+        return cube, integ_time
+
+    def clear(self):
+        '''
+        Empty the cache and reset the hit and miss counters.
+        '''
+
+        self._entries.clear()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+
+# Cache shared by the plotting helpers
+cube_cache = CubeCache()
+
+
+class DarkCache(object):
+
+    def __init__(self, max_bytes = 1024**3, mmap_dir = None):
+        '''
+        Memory-bounded cache of dark reference cubes and their cumulative read differences, 
+        keyed by reference file (path, modification time and size) and by the read times of 
+        the sample sequence they are matched to, that evicts the least recently used darks first. A program only uses a few distinct 
+        darks, so batch read removal loads each of them once per process.
+
+        Parameters
+        ----------
+        max_bytes : int
+            Largest total size of the dark cubes held in memory or memory-mapped, in bytes. 
+            Default is 1 GB.
+
+        mmap_dir : str, optional
+            Directory of .npy sidecar files backing the dark cubes. The cubes are then 
+            memory-mapped read-only from the sidecars, which are named after the full cache key 
+            and reused by later processes. Sidecars are written to temporary files and moved 
+            into place, so processes sharing the directory never read a partly written one. 
+            It is created if needed. Default is None, which keeps the cubes in memory.
+        '''
+
+        self.max_bytes = max_bytes
+        self.mmap_dir = mmap_dir
+        if mmap_dir is not None:
+            os.makedirs(mmap_dir, exist_ok = True)
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get(self, dark_file, integ_time):
+        '''
+        Return the reads of a dark reference file matching the read times of a sample sequence, 
+        their cumulative differences and the error of the final read, loading and caching them 
+        on a miss.
+
+        Parameters
+        ----------
+        dark_file : str
+            Path to a WFC3 IR dark reference file.
+
+        integ_time : array-like
+            Integration times of the reads of the sample sequence in ascending order.
+
+        Returns
+        -------
+        dark : array-like
+            Read-only NSAMPx1024x1024 dark cube in ascending time order.
+
+        dark_diff : array-like
+            Read-only (NSAMP-1)x1024x1024 difference between each dark read and the one before.
+
+        dark_err : array-like
+            Read-only error of the final dark read.
+        '''
+
+        times = tuple(float(t) for t in np.round(integ_time, 3))
+        stat = os.stat(dark_file)
+        key = (os.path.abspath(dark_file), stat.st_mtime, stat.st_size, times)
+        if key in self._entries:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+        self.misses += 1
+        if self.mmap_dir is not None:
+            # The name holds a digest of the whole key, so a sidecar only ever holds one dark, and 
+            # the three sidecars of a key have the same content whichever process wrote them
+            root = os.path.basename(dark_file).split('.')[0]
+            digest = hashlib.sha1(repr(key).encode()).hexdigest()[:16]
+            sidecar = os.path.join(self.mmap_dir, f'{root}_{len(times)}reads_{digest}')
+            sidecars = [f'{sidecar}{suffix}.npy' for suffix in ('', '_diff', '_err')]
+            if not all(os.path.exists(f) for f in sidecars):
+                for f, array in zip(sidecars, self._load(dark_file, integ_time)):
+                    fd, tmp_file = tempfile.mkstemp(dir = self.mmap_dir, suffix = '.tmp')
+                    with os.fdopen(fd, 'wb') as tmp:
+                        np.save(tmp, array)
+                    os.replace(tmp_file, f)
+            entry = tuple(np.load(f, mmap_mode = 'r') for f in sidecars)
+        else:
+            entry = self._load(dark_file, integ_time)
+            for array in entry:
+                array.setflags(write = False)
+
+        self._entries[key] = entry
+        self.nbytes += sum(array.nbytes for array in entry)
+        while self.nbytes > self.max_bytes and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last = False)
+            self.nbytes -= sum(array.nbytes for array in evicted)
+
+        return entry
+
+    def _load(self, dark_file, integ_time):
+        # Read only the dark reads matching the sample sequence, by integration time
+        with fits.open(dark_file, memmap = True) as dark_im:
+            nsamp = dark_im[0].header['NSAMP']
+            dark_times = np.array([dark_im[('TIME', i)].header['PIXVALUE'] for i in range(1, nsamp + 1)])
+            imsets = []
+            for time in integ_time:
+                match = np.flatnonzero(np.isclose(dark_times, time, rtol = 0, atol = 0.01))
+                if len(match) == 0:
+                    raise ValueError(f"No read of {dark_file} has an integration time of {time} s.")
+                imsets.append(match[0] + 1)
+
+            hdr1 = dark_im[('SCI', imsets[0])].header
+            dark = np.empty((len(imsets), hdr1['NAXIS2'], hdr1['NAXIS1']), dtype = np.float32)
+            for i, imset in enumerate(imsets):
+                dark[i] = dark_im[('SCI', imset)].data
+            dark_err = np.array(dark_im[('ERR', imsets[-1])].data, dtype = np.float32)
+
+        return dark, np.diff(dark, axis = 0), dark_err
+
+    def clear(self):
+        '''
+        Empty the cache and reset the hit and miss counters. Sidecar files are kept.
+        '''
+
+        self._entries.clear()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+
+# Cache of the darks used by remove_reads
+dark_cache = DarkCache()
+
+
+def get_region_stats(cube, regions, stats = ('median', 'std', 'mad', 'clipped_mean'), clip_sigma = 3.,
+                     mask = None, threshold = None):
+    
+    '''
+    Compute NaN-aware statistics of any number of rectangular regions for every read of a 
+    datacube in a single traversal. Each read is visited once and all the regions are measured 
+    while it is in memory. The region values are copied into one reusable scratch buffer and 
+    partitioned in place, so no per-region copies or temporary arrays are made. Excluded pixels 
+    are only blanked in the scratch buffer, so the cube is never modified or copied.
+
+    Parameters
+    ----------
+    cube : array-like
+       1024x1024xNSAMP datacube of the IR image in ascending time order, 
+       where NSAMP is the number of samples taken.
+
+    regions : dict
+       Regions to measure, keyed by name. Each region is a dict of its four corners 
+       (x0, x1, y0, y1), which follow Python slicing rules, e.g. 
+       {"x0":5, "x1":-5, "y0":5, "y1":-5} is the full frame minus a 5 pixel border.
+
+    stats : tuple of str
+       The statistics to compute, any of "median", "std", "mad" (median absolute deviation) 
+       and "clipped_mean" (mean of the values within clip_sigma standard deviations of the 
+       median, with the standard deviation estimated as 1.4826*MAD).
+
+    clip_sigma : float
+       Clipping threshold of the clipped mean, in standard deviations.
+
+    mask : array-like, optional
+       Boolean array, True for the pixels to exclude, either 1024x1024 for all the reads or 
+       with the shape of the cube for each read. Default is None.
+
+    threshold : float, optional
+       Exclude the pixels whose absolute value is above threshold. Default is None.
+           
+    Returns
+    -------
+    region_stats : dict
+        For each region name, a dict of arrays with each requested statistic for each read.
+    '''
+
+    nread = cube.shape[-1]
+    slices = {name: (slice(region['y0'], region['y1']), slice(region['x0'], region['x1']))
+              for name, region in regions.items()}
+    sizes = [cube[sl][..., 0].size for sl in slices.values()]
+
+    region_stats = {name: {stat: np.full(nread, np.nan) for stat in stats} for name in regions}
+
+    # Scratch buffers shared by every region and read. Values keep the precision of the cube, 
+    # the deviations used for the moments are accumulated in double precision.
+    values = np.empty(max(sizes), dtype = np.result_type(cube.dtype, np.float32))
+    deviation = np.empty(max(sizes))
+    flags = np.empty(max(sizes), dtype = bool)
+    in_range = np.empty(max(sizes), dtype = bool)
+
+    for i in range(nread):
+        read = cube[..., i]
+        read_mask = None if mask is None else mask[..., i] if mask.ndim == 3 else mask
+        for name, sl in slices.items():
+            view = read[sl]
+            n = view.size
+            flat = values[:n]
+            np.copyto(flat.reshape(view.shape), view)
+
+            # Excluded pixels are treated as NaNs
+            if read_mask is not None:
+                np.copyto(flat.reshape(view.shape), np.nan, where = read_mask[sl])
+            if threshold is not None:
+                np.greater(np.abs(flat, out = deviation[:n]), threshold, out = flags[:n])
+                np.copyto(flat, np.nan, where = flags[:n])
+
+            nvalid = n - np.count_nonzero(np.isnan(flat, out = flags[:n]))
+            if nvalid == 0:
+                continue
+            valid = flat[:nvalid]
+            out = region_stats[name]
+
+            # NaNs sort last, so partitioning at nvalid-1 moves them all past the valid values
+            flat.partition([(nvalid-1)//2, nvalid//2, nvalid-1])
+            median = 0.5*(float(flat[(nvalid-1)//2]) + float(flat[nvalid//2]))
+            if 'median' in out:
+                out['median'][i] = median
+
+            if 'std' in out:
+                mean = valid.sum(dtype = np.float64)/nvalid
+                d = np.subtract(valid, mean, out = deviation[:nvalid])
+                out['std'][i] = np.sqrt(np.dot(d, d)/nvalid)
+
+            if 'mad' in out or 'clipped_mean' in out:
+                d = np.subtract(valid, median, out = deviation[:nvalid])
+                np.abs(d, out = d)
+                d.partition([(nvalid-1)//2, nvalid//2])
+                mad = 0.5*(d[(nvalid-1)//2] + d[nvalid//2])
+                if 'mad' in out:
+                    out['mad'][i] = mad
+
+                if 'clipped_mean' in out:
+                    limit = clip_sigma*1.4826*mad
+                    keep = np.greater_equal(valid, median - limit, out = flags[:nvalid])
+                    keep &= np.less_equal(valid, median + limit, out = in_range[:nvalid])
+                    out['clipped_mean'][i] = np.sum(valid, where = keep, dtype = np.float64)/np.count_nonzero(keep)
+
+    return region_stats
+
+
+def get_label_stats(cube, labels, mask = None, threshold = None):
+    
+    '''
+    Compute the NaN-aware median, mean and standard deviation of every labeled zone of an 
+    integer label image for every read of a datacube, vectorized over all reads and zones at 
+    once. The cost does not depend on the number of zones: the pixels are grouped by label 
+    once, the sums are reduced per zone with a single np.add.reduceat, and the medians come 
+    from one sort of combined (label, value) integer keys. Medians are computed at float32 
+    precision.
+
+    Parameters
+    ----------
+    cube : array-like
+       1024x1024xNSAMP datacube of the IR image in ascending time order, 
+       where NSAMP is the number of samples taken.
+
+    labels : array-like
+       1024x1024 integer label image. Pixels labeled 0 or less are ignored. Label images 
+       can be built with get_amp_labels, get_radial_labels and get_region_labels, or from 
+       any custom mask.
+
+    mask : array-like, optional
+       Boolean array, True for the pixels to exclude, either 1024x1024 for all the reads or 
+       with the shape of the cube for each read. Default is None.
+
+    threshold : float, optional
+       Exclude the pixels whose absolute value is above threshold. Default is None.
+           
+    Returns
+    -------
+    label_stats : dict
+        "labels" holds the label values found in the label image. "median", "mean", "std" 
+        and "npix" (the number of finite, not excluded pixels) are arrays with one row per label and one 
+        column per read.
+    '''
+
+    nread = cube.shape[-1]
+    labels = np.asarray(labels).ravel()
+
+    # Group the labeled pixels by label; reads become rows of a (nread, npix) array
+    pixels = np.flatnonzero(labels > 0)
+    pixels = pixels[np.argsort(labels[pixels], kind = 'stable')]
+    label_values, starts, sizes = np.unique(labels[pixels], return_index = True, return_counts = True)
+    values = np.moveaxis(cube, -1, 0).reshape(nread, -1)[:, pixels]
+
+    finite = np.isfinite(values)
+    if mask is not None:
+        mask = np.broadcast_to(mask[..., None], cube.shape) if mask.ndim == 2 else mask
+        finite &= ~np.moveaxis(mask, -1, 0).reshape(nread, -1)[:, pixels]
+    if threshold is not None:
+        with np.errstate(invalid = 'ignore'):
+            finite &= np.abs(values) <= threshold
+    npix = np.add.reduceat(finite, starts, axis = 1)
+    valid = np.maximum(npix, 1)
+    sums = np.add.reduceat(np.where(finite, values, 0.), starts, axis = 1, dtype = np.float64)
+    mean = sums/valid
+    deviation = np.where(finite, values - np.repeat(mean, sizes, axis = 1), 0.)
+    std = np.sqrt(np.add.reduceat(deviation*deviation, starts, axis = 1)/valid)
+    del deviation
+
+    # Order-preserving map of float32 values onto uint32, with the label rank in the upper 
+    # 32 bits, so a single sort orders the values within each label and NaNs last
+    bits = np.where(finite, values, np.nan).astype(np.float32).view(np.uint32)
+    keys = (bits ^ np.where(bits >> 31, np.uint32(0xFFFFFFFF), np.uint32(0x80000000))).astype(np.uint64)
+    keys |= np.repeat(np.arange(len(label_values), dtype = np.uint64), sizes) << np.uint64(32)
+    keys.sort(axis = 1)
+
+    def value_at(position):
+        key = np.take_along_axis(keys, position, axis = 1).astype(np.uint32)
+        return (key ^ np.where(key >> 31, np.uint32(0x80000000), np.uint32(0xFFFFFFFF))).view(np.float32)
+
+    low = starts + (valid - 1)//2
+    high = starts + valid//2
+    median = 0.5*(value_at(low).astype(np.float64) + value_at(high))
+
+    no_data = npix == 0
+    for stat in (median, mean, std):
+        stat[no_data] = np.nan
+
+    return {'labels': label_values, 'median': median.T, 'mean': mean.T, 'std': std.T, 'npix': npix.T}
+
+
+def get_amp_labels(shape = (1024, 1024)):
+    
+    '''
+    Build a label image of the four IR amplifier quadrants.
+
+    Parameters
+    ----------
+    shape : tuple of int
+       Shape of the full-frame image.
+
+    Returns
+    -------
+    labels : array-like
+        Label image with quadrants A, B, C and D labeled 1 to 4.
+    '''
+
+    ny, nx = shape
+    labels = np.zeros(shape, dtype = int)
+    labels[ny//2:, :nx//2] = 1
+    labels[:ny//2, :nx//2] = 2
+    labels[:ny//2, nx//2:] = 3
+    labels[ny//2:, nx//2:] = 4
+    
+    return labels
+
+
+def get_radial_labels(edges, shape = (1024, 1024), center = None):
+    
+    '''
+    Build a label image of concentric annuli.
+
+    Parameters
+    ----------
+    edges : list of float
+       Increasing radii, in pixels, of the annuli edges. Annulus k (labeled k) covers 
+       edges[k-1] <= r < edges[k].
+
+    shape : tuple of int
+       Shape of the full-frame image.
+
+    center : tuple of float
+       The (x, y) center of the annuli. Default is the center of the image.
+
+    Returns
+    -------
+    labels : array-like
+        Label image with the annuli labeled from 1 outwards, and 0 outside of them.
+    '''
+
+    ny, nx = shape
+    if center is None:
+        center = ((nx - 1)/2., (ny - 1)/2.)
+    y, x = np.indices(shape)
+    radius = np.hypot(x - center[0], y - center[1])
+
+    labels = np.digitize(radius, edges)
+    labels[radius >= edges[-1]] = 0
+    
+    return labels
+
+
+def get_region_labels(regions, shape = (1024, 1024)):
+    
+    '''
+    Build a label image from rectangular regions.
+
+    Parameters
+    ----------
+    regions : list of dict
+       The four corners (x0, x1, y0, y1) of each region. Where regions overlap, the later 
+       region takes the pixel.
+
+    shape : tuple of int
+       Shape of the full-frame image.
+
+    Returns
+    -------
+    labels : array-like
+        Label image with the regions labeled 1 to N in the order given, and 0 elsewhere.
+    '''
+
+    labels = np.zeros(shape, dtype = int)
+    for i, region in enumerate(regions, start = 1):
+        labels[region['y0']:region['y1'], region['x0']:region['x1']] = i
+    
+    return labels
+
+
+def screen_ima(ima_filename, difference_method = 'instantaneous', lhs_region = LHS_REGION, 
+               rhs_region = RHS_REGION):
+    
+    '''
+    Score every read of an IMA for background jumps and left/right gradients, using robust 
+    statistics of the difference between reads. The scores of all reads are computed at once 
+    and are the deviation of each read from the median of the reads, in units of the larger 
+    of the scatter between reads and the noise of the read medians. The difference to the 
+    zeroth read is left out of the median and scatter, since it is dominated by the reset.
+
+    Parameters
+    ----------
+    ima_filename : str
+        Path to a full-frame IR IMA image fits file.
+        
+    difference_method: str
+       The method of finding the difference between reads. 
+       Either "instantaneous" or "cumulative".    
+       
+    lhs_region:  dict
+       The four corners (x0, x1, y0, y1) of the left hand region.
+
+    rhs_region : dict
+       The four corners (x0, x1, y0, y1) of the right hand region.
+
+    Returns
+    -------
+    scores : Table
+        One row per difference between reads, with the IMSET of the later read, its 
+        integration time, the full-frame, LHS and RHS median signal differences, and the 
+        jump and gradient scores.
+    '''
+
+    from astropy.table import Table
+
+    cube, integ_time = read_wfc3_cube(ima_filename)
+    cube = cube.transpose(1, 2, 0)
+    diff_cube = compute_diff_imas(cube, integ_time, diff_method = difference_method, dtype = np.float32)
+    del cube
+
+    regions = {'full': FULL_FRAME_REGION, 'lhs': lhs_region, 'rhs': rhs_region}
+    region_stats = get_region_stats(diff_cube, regions, stats = ('median', 'mad'))
+    npix = {name: diff_cube[..., 0][region['y0']:region['y1'], region['x0']:region['x1']].size 
+            for name, region in regions.items()}
+
+    def noise(name):
+        # Standard error of the median of a region, from its pixel scatter
+        return 1.2533*1.4826*region_stats[name]['mad']/np.sqrt(npix[name])
+
+    def score(values, errors):
+        # The first difference is to the zeroth read, so keep it out of the baseline
+        baseline = np.nanmedian(values[1:])
+        scatter = 1.4826*np.nanmedian(np.abs(values[1:] - baseline))
+        return (values - baseline)/np.maximum(scatter, np.nanmedian(errors[1:]))
+
+    median = region_stats['full']['median']
+    delta = region_stats['lhs']['median'] - region_stats['rhs']['median']
+    jump_score = score(median, noise('full'))
+    gradient_score = score(delta, np.hypot(noise('lhs'), noise('rhs')))
+
+    nsamp = len(integ_time)
+    k = np.arange(nsamp - 1)
+    path, filename = os.path.split(ima_filename)
+
+    return Table({'filename': np.full(len(k), filename),
+                  'rootname': np.full(len(k), filename.split('_')[0]),
+                  'imset': nsamp - 1 - k,
+                  'integ_time': integ_time[1:],
+                  'median': median,
+                  'median_lhs': region_stats['lhs']['median'],
+                  'median_rhs': region_stats['rhs']['median'],
+                  'jump_score': jump_score,
+                  'gradient_score': gradient_score})
+
+
+def find_anomalous_reads(ima_files, difference_method = 'instantaneous', lhs_region = LHS_REGION,
+                         rhs_region = RHS_REGION, jump_threshold = 5., gradient_threshold = 5., 
+                         flagged_only = True, processes = None):
+    
     '''
-    Read a full-frame IR image and return the datacube plus integration times for each read.
-    Requires the path to a RAW full-frame IR image fits file (filename).
+    Screen many IMA files for reads affected by background jumps (e.g. scattered light or 
+    time-variable background) or LHS/RHS gradients, without plotting. The files are screened 
+    in parallel with screen_ima. The IMSETs found can be passed as bad reads to the read 
+    removal or calwf3 masking steps.
 
     Parameters
     ----------
-    filename : str
-        Path to a RAW full-frame IR image fits file.
+    ima_files : list of str
+        Paths to full-frame IR IMA image fits files.
+        
+    difference_method: str
+       The method of finding the difference between reads. 
+       Either "instantaneous" or "cumulative".    
+       
+    lhs_region:  dict
+       The four corners (x0, x1, y0, y1) of the left hand region.
+
+    rhs_region : dict
+       The four corners (x0, x1, y0, y1) of the right hand region.
+
+    jump_threshold : float
+       Reads whose absolute jump score is above this are flagged.
+
+    gradient_threshold : float
+       Reads whose absolute gradient score is above this are flagged.
+
+    flagged_only : bool
+       Set to False to return the scores of every read, not just the flagged ones.
+
+    processes : int
+       Number of worker processes. Default is None, which uses all the CPUs. 
+       Set to 1 to screen the files in this process.
 
     Returns
     -------
-    cube : array-like
-        1024x1024xNSAMP datacube of the IR image in ascending time order, 
-        where NSAMP is the number of samples taken.
-  
-    integ_time : array-like
-        Integration times associated with the datacube in ascending order.    
+    reads : Table
+        Table of the suspected bad IMSETs of each file with their scores, as returned by 
+        screen_ima, and a "flagged" column. Files that cannot be screened are reported 
+        and skipped.
     '''
-    
-    with fits.open(filename) as f:
-        hdr = f[0].header
-        NSAMP = hdr['NSAMP']
-        hdr1 = f[1].header
-        cube = np.zeros((hdr1['NAXIS1'],hdr1['NAXIS2'],NSAMP), dtype = float)
-        integ_time = np.zeros(shape = (NSAMP))
 
-        for i in range(1, NSAMP+1):
-            cube[:,:,i-1] = f[('SCI', i)].data
-            integ_time[i-1] = f[('TIME', i)].header['PIXVALUE']
+    from astropy.table import Table, vstack
 
-        cube = cube[:,:,::-1]
-        integ_time = integ_time[::-1]
-    return cube, integ_time
+    screen = partial(screen_ima, difference_method = difference_method, 
+                     lhs_region = lhs_region, rhs_region = rhs_region)
+    results = {}
+    if processes == 1:
+        for i, ima in enumerate(ima_files):
+            try:
+                results[i] = screen(ima)
+            except Exception as e:
+                print(f'Could not process {ima}: {e}')
+    else:
+        with ProcessPoolExecutor(max_workers = processes) as executor:
+            futures = {executor.submit(screen, ima): i for i, ima in enumerate(ima_files)}
+            for future in as_completed(futures):
+                try:
+                    results[futures[future]] = future.result()
+                except Exception as e:
+                    print(f'Could not process {ima_files[futures[future]]}: {e}')
 
+    if len(results) == 0:
+        return Table(names = ('filename', 'rootname', 'imset', 'integ_time', 'median', 'median_lhs', 
+                              'median_rhs', 'jump_score', 'gradient_score', 'flagged'),
+                     dtype = (str, str, int, float, float, float, float, float, float, bool))
 
+    reads = vstack([results[i] for i in sorted(results)])
+    reads['flagged'] = (np.abs(reads['jump_score']) > jump_threshold) | \
+                       (np.abs(reads['gradient_score']) > gradient_threshold)
+    if flagged_only:
+        reads = reads[reads['flagged']]
 
-def compute_diff_imas(cube, integ_time, diff_method):
-    
+    return reads
+
+
+def get_ref_file(header, keyword):
     '''
-    Compute the difference in signal between reads of a WFC3 IR IMA file.
-    
+    Resolve the path of a calibration reference file named in a header, e.g. 'iref$xxx_drk.fits', 
+    using the 'iref' environment variable.
+
     Parameters
     ----------
-    cube : array-like
-       1024x1024xNSAMP datacube of the IR image in ascending time order, 
-       where NSAMP is the number of samples taken.
+    header : Header
+        Primary header of a calibrated WFC3 file.
 
-    integ_time : array-like
-       Integration times associated with the datacube in ascending order.
+    keyword : str
+        Reference file keyword, e.g. 'DARKFILE'.
 
-    diff_method: str
-       The method of finding the difference between reads. 
-       Either "instantaneous" or "cumulative".
-           
     Returns
-    --------
-    diff : array-like
-        1024x1024x(NSAMP-1) datacube of the differebce between IR IMA reads in ascending time order, 
-        where NSAMP is the number of samples taken.
+    -------
+    ref_file : str
+        Path to the reference file.
     '''
-    
-    if diff_method == 'instantaneous':
-        ima_j = cube[:, :, 1:]
-        ima_j_1 = cube[:,:,0:-1]
-        t_0 = integ_time[0]
-        t_j = integ_time[1:]
-        t_j_1 = integ_time[0:-1]
-        
-        diff = ((ima_j*(t_j-t_0))-(ima_j_1*(t_j_1-t_0)))/(t_j-t_j_1)
-        
-    elif diff_method == 'cumulative':
-        diff = cube[:,:,0:-1] - cube[:,:,1:]
-        
-    else: # if an incorrect method is chosen raise an error
-        raise ValueError(f"{diff_method} is an invalid method. The allowed methods are 'instantaneous' and 'cumulative'.")
 
-    return diff
+    ref_file = header[keyword]
+    if ref_file.startswith('iref$'):
+        if os.getenv('iref') is None:
+            raise ValueError(f"The 'iref' environment variable must be set to find {ref_file}.")
+        ref_file = os.path.join(os.getenv('iref'), ref_file[len('iref$'):])
+
+    return ref_file
+
+
+def get_amp_values(header, keyword, shape = (1024, 1024)):
+    '''
+    Build an image of a per-amplifier header value, e.g. read noise ('READNSE') or gain ('ATODGN'), 
+    with the amplifier quadrants of get_amp_labels.
+
+    Parameters
+    ----------
+    header : Header
+        Primary header of a calibrated WFC3 IR file.
+
+    keyword : str
+        Keyword prefix, completed by the amplifier letters A to D.
+
+    shape : tuple of int
+        Shape of the image.
+
+    Returns
+    -------
+    values : array-like
+        Image of the value of each amplifier.
+    '''
+
+    amp_values = np.array([0.] + [header[keyword + amp] for amp in 'ABCD'])
+
+    return amp_values[get_amp_labels(shape)]
+
+
+def remove_reads(ima_filename, bad_reads, flt_filename = None, output = None, dark_file = None, cache = None):
+    '''
+    From the final read of a calibrated IMA, subtract the signal accumulated during reads affected 
+    by anomalies (e.g. scattered light or satellite trails), and write the corrected science and 
+    error images to an FLT product. This follows section 5 of WFC3 ISR 2016-16 and works on the IMA 
+    as calibrated by the pipeline, so calwf3 does not need to be run again. 
+
+    Only the final read, the bad reads and the reads preceding them are read from the IMA, the dark 
+    comes from a DarkCache, and all the bad reads are subtracted at once. The error combines the read 
+    noise, the Poisson noise of the remaining signal and dark, and the dark and flat field errors.
+
+    Parameters
+    ----------
+    ima_filename : str
+        Path to a full-frame IR IMA image fits file.
+
+    bad_reads : list of int
+        IMSET numbers (science extension numbers) of the reads affected by anomalies. The zero 
+        read (IMSET NSAMP) cannot be removed.
+
+    flt_filename : str
+        Path to the FLT product of the IMA, used as the template of the output. Default is None, 
+        which uses the FLT next to the IMA if it exists, or else builds the FLT from the IMA.
+
+    output : str
+        Path to the corrected FLT file. Default is None, which updates flt_filename.
+
+    dark_file : str
+        Path to the dark reference file. Default is None, which uses DARKFILE from the IMA header.
+
+    cache : DarkCache
+        Cache the dark is taken from, e.g. one with memory-mapped sidecars shared by worker 
+        processes. Default is None, which uses the module-wide dark_cache.
+
+    Returns
+    -------
+    output : str
+        Path to the corrected FLT file.
+    '''
+
+    if flt_filename is None:
+        flt_filename = ima_filename.replace('_ima.fits', '_flt.fits')
+    if output is None:
+        output = flt_filename
+    if cache is None:
+        cache = dark_cache
+
+    with fits.open(ima_filename, memmap = True) as ima:
+        hdr = ima[0].header
+        nsamp = hdr['NSAMP']
+        bad_reads = np.atleast_1d(bad_reads).astype(int)
+        if np.any((bad_reads < 1) | (bad_reads >= nsamp)):
+            raise ValueError(f"Bad reads must be IMSETs between 1 and {nsamp-1}, got {bad_reads}.")
+
+        # The final counts are the counts of IMSET 1 minus, for each bad read, its counts 
+        # minus the counts of the read before it (IMSET + 1)
+        coefficients = {1: 1.}
+        for imset in bad_reads:
+            coefficients[imset] = coefficients.get(imset, 0.) - 1.
+            coefficients[imset + 1] = coefficients.get(imset + 1, 0.) + 1.
+        imsets = np.array(list(coefficients))
+        coefficients = np.array(list(coefficients.values()))
+
+        times = np.array([ima[('TIME', imset)].header['PIXVALUE'] for imset in imsets])
+        reads = np.array([ima[('SCI', imset)].data for imset in imsets], dtype = np.float32)
+        final_sci = np.tensordot(coefficients*times, reads, axes = 1)
+        final_time = np.dot(coefficients, times)
+
+        if dark_file is None:
+            dark_file = get_ref_file(hdr, 'DARKFILE')
+        integ_time = np.array([ima[('TIME', i)].header['PIXVALUE'] for i in range(nsamp, 0, -1)])
+        dark, dark_diff, dark_err = cache.get(dark_file, integ_time)
+        final_dark = dark[-1] - dark_diff[nsamp - bad_reads - 1].sum(axis = 0)
+
+        with fits.open(get_ref_file(hdr, 'PFLTFILE')) as pflat_im:
+            pflat, pflat_err = pflat_im['SCI'].data, pflat_im['ERR'].data
+        with fits.open(get_ref_file(hdr, 'DFLTFILE')) as dflat_im:
+            dflat, dflat_err = dflat_im['SCI'].data, dflat_im['ERR'].data
+
+        rn = get_amp_values(hdr, 'READNSE', final_sci.shape)
+        gain = get_amp_values(hdr, 'ATODGN', final_sci.shape)
+
+        # Variance terms: read noise, Poisson noise of the signal and dark (in electrons), 
+        # dark error and flat field errors
+        flat = pflat*dflat
+        signal = final_sci*flat + final_dark*gain
+        final_err = np.sqrt(rn**2 + signal + (dark_err*gain)**2 + (pflat_err*final_sci*dflat)**2 
+                            + (dflat_err*final_sci*pflat)**2)
+        final_err /= flat*final_time
+        final_err[np.isnan(final_err)] = 0
+
+        # Convert the science image back to a count rate
+        final_sci /= final_time
+
+        update = os.path.exists(flt_filename) and os.path.abspath(output) == os.path.abspath(flt_filename)
+        if os.path.exists(flt_filename):
+            flt = fits.open(flt_filename, mode = 'update' if update else 'readonly')
+        else:
+            # Build the FLT from the IMA, trimming the reference pixels
+            flt = fits.HDUList([fits.PrimaryHDU(header = hdr.copy())])
+            for extname in ['SCI', 'ERR', 'DQ']:
+                ext_hdr = ima[(extname, 1)].header.copy()
+                for key in ['CRPIX1', 'CRPIX2', 'LTV1', 'LTV2']:
+                    if key in ext_hdr:
+                        ext_hdr[key] -= 5
+                flt.append(fits.ImageHDU(ima[(extname, 1)].data[5:-5, 5:-5], header = ext_hdr))
+            flt[0].header['FILENAME'] = os.path.basename(output)
+
+    with flt:
+        flt['SCI'].data = final_sci[5:-5, 5:-5].astype(np.float32)
+        flt['ERR'].data = final_err[5:-5, 5:-5].astype(np.float32)
+
+        flt[0].header['IMA2FLT'] = (1, 'FLT extracted from IMA file')
+        flt[0].header['EXPTIME'] = final_time
+        flt[0].header['NPOP'] = (len(bad_reads), 'Number of reads popped from the sequence')
 
+        if update:
+            flt.flush()
+        else:
+            flt.writeto(output, overwrite = True)
+
+    return output
 
-def get_median_fullframe_lhs_rhs(cube, lhs_region, rhs_region):
+
+def get_median_fullframe_lhs_rhs(cube, lhs_region, rhs_region, mask = None, threshold = None):
     
     '''
     Compute the median in the full-frame image, the user-defined left side region, and the user-defined right side region. 
@@ -101,6 +1272,12 @@ def get_median_fullframe_lhs_rhs(cube, lhs_region, rhs_region):
 
     rhs_region : dict
        The four corners (x0, x1, y0, y1) of the right hand region.
+
+    mask : array-like, optional
+       Boolean array of the pixels to exclude, as in get_region_stats. Default is None.
+
+    threshold : float, optional
+       Exclude the pixels whose absolute value is above threshold. Default is None.
            
     Returns
     -------
@@ -115,16 +1292,12 @@ def get_median_fullframe_lhs_rhs(cube, lhs_region, rhs_region):
     '''
     
     
-    median_full_frame = np.nanmedian(cube[5:-5,5:-5,:], axis = (0,1))
-    median_lhs = np.nanmedian(cube[lhs_region['y0']:lhs_region['y1'],
-                                      lhs_region['x0']:lhs_region['x1'],:], axis = (0,1))
-    median_rhs = np.nanmedian(cube[rhs_region['y0']:rhs_region['y1'],
-                                      rhs_region['x0']:rhs_region['x1'],:], axis = (0,1))
-    
+    region_stats = get_region_stats(cube, {'full': FULL_FRAME_REGION, 'lhs': lhs_region, 'rhs': rhs_region},
+                                    stats = ('median',), mask = mask, threshold = threshold)
     
-    return median_full_frame, median_lhs, median_rhs
+    return region_stats['full']['median'], region_stats['lhs']['median'], region_stats['rhs']['median']
 
-def get_std_fullframe_lhs_rhs(cube, lhs_region, rhs_region):
+def get_std_fullframe_lhs_rhs(cube, lhs_region, rhs_region, mask = None, threshold = None):
      
     '''
     Compute the standard deviation of the signal in the full-frame image, the user-defined left side region, 
@@ -142,6 +1315,11 @@ def get_std_fullframe_lhs_rhs(cube, lhs_region, rhs_region):
     rhs_region : dict
        The four corners (x0, x1, y0, y1) of the right hand region.
 
+    mask : array-like, optional
+       Boolean array of the pixels to exclude, as in get_region_stats. Default is None.
+
+    threshold : float, optional
+       Exclude the pixels whose absolute value is above threshold. Default is None.
 
     Returns
     -------
@@ -156,14 +1334,10 @@ def get_std_fullframe_lhs_rhs(cube, lhs_region, rhs_region):
     '''
     
     
-    standard_dev_fullframe = np.nanstd(cube[5:-5,5:-5,:], axis = (0,1))
-    standard_dev_lhs = np.nanstd(cube[lhs_region['y0']:lhs_region['y1'],
-                                      lhs_region['x0']:lhs_region['x1'],:], axis = (0,1))
-    standard_dev_rhs = np.nanstd(cube[rhs_region['y0']:rhs_region['y1'],
-                                      rhs_region['x0']:rhs_region['x1'],:], axis = (0,1))
-    
+    region_stats = get_region_stats(cube, {'full': FULL_FRAME_REGION, 'lhs': lhs_region, 'rhs': rhs_region},
+                                    stats = ('std',), mask = mask, threshold = threshold)
     
-    return standard_dev_fullframe, standard_dev_lhs, standard_dev_rhs
+    return region_stats['full']['std'], region_stats['lhs']['std'], region_stats['rhs']['std']
         
 
 def plot_ramp(ima, integ_time, median_diff_fullframe, median_diff_lhs, median_diff_rhs):
@@ -190,6 +1364,8 @@ def plot_ramp(ima, integ_time, median_diff_fullframe, median_diff_lhs, median_di
     median_diff_rhs: array-like
         The median difference in signal between the right side of each read.
     '''
+
+    import matplotlib.pyplot as plt
     
     plt.plot(integ_time[2:], median_diff_fullframe[1:], 's', markersize = 25, label = 'Full Frame',  color = 'black')
     plt.plot(integ_time[2:], median_diff_lhs[1:], '<', markersize = 20, label = 'LHS', color = 'orange')
@@ -203,8 +1379,90 @@ def plot_ramp(ima, integ_time, median_diff_fullframe, median_diff_lhs, median_di
     plt.title(ima)
         
         
+def plot_label_ramp(ima, integ_time, label_stats, label_names = None):
+    
+    '''
+    Plots the signal accumulation ramp of every zone of a label image. Each point is the median 
+    signal (in e-/s) of the difference between subsequent reads in that zone.
+    
+    Parameters
+    -----------
+    ima: str
+        Name of the IMA file.
+
+    integ_time : array-like
+        Integration times associated with the datacube in ascending order.
+
+    label_stats: dict
+        Statistics of the difference between reads returned by get_label_stats.
+
+    label_names: list of str
+        Legend name of each label. Default is "Label N".
+    '''
+
+    import matplotlib.pyplot as plt
+    
+    if label_names is None:
+        label_names = [f'Label {label}' for label in label_stats['labels']]
+
+    for median, name in zip(label_stats['median'], label_names):
+        plt.plot(integ_time[2:], median[1:], 'o-', markersize = 10, label = name)
+    ax = plt.gca()
+    for spine in ['top', 'bottom', 'left', 'right']: ax.spines[spine].set_visible(False)
+    plt.grid()
+    plt.xlabel('SAMPTIME [s]')
+    plt.ylabel('$\mu$ [e-/s]')
+    plt.legend(loc = 0)
+    plt.title(ima)
+        
+        
+def show_image(ax, image, downsample = False, **kwargs):
+    '''
+    Draw an image on an axis with imshow, optionally block averaged down to the resolution 
+    the axis is displayed at. The image keeps its pixel coordinates, so text and regions can 
+    still be placed in pixels of the full image.
+
+    Parameters
+    ----------
+    ax : axis object
+        The axis to draw the image on.
+
+    image : array-like
+        2D image.
+
+    downsample: bool
+        Set to True to block average the image by the integer factor that brings it closest 
+        to, without going below, the size of the axis in display pixels.
+
+    **kwargs
+        Passed to imshow.
+
+    Returns
+    -------
+    im : image object
+        The image drawn, as returned by imshow.
+    '''
+
+    import matplotlib.pyplot as plt
+
+    ny, nx = image.shape
+    if downsample:
+        bbox = ax.get_window_extent()
+        factor = int(max(1, min(nx/bbox.width, ny/bbox.height)))
+        if factor > 1:
+            ny, nx = ny//factor*factor, nx//factor*factor
+            image = image[:ny,:nx].reshape(ny//factor, factor, nx//factor, factor).mean(axis = (1, 3))
+            if kwargs.get('origin', plt.rcParams['image.origin']) == 'lower':
+                kwargs['extent'] = (-0.5, nx - 0.5, -0.5, ny - 0.5)
+            else:
+                kwargs['extent'] = (-0.5, nx - 0.5, ny - 0.5, -0.5)
+
+    return ax.imshow(image, **kwargs)
+
+
 def panel_plot(cube, integ_time, median_diff_full_frame, median_diff_lhs, median_diff_rhs,
-               standard_dev_fullframe, standard_dev_lhs, standard_dev_rhs, diff_method):
+               standard_dev_fullframe, standard_dev_lhs, standard_dev_rhs, diff_method, diff_cube = None,
+               downsample = False, vmin = None, vmax = None):
     '''
     Plot the difference between individual reads of an IMA image file in a
     panel plot up to 4x4 in size (i.e. SCI[16]-SCI[15], SCI[15]-SCI[14], SCI[14]-SCI[15], etc.).
@@ -239,6 +1497,18 @@ def panel_plot(cube, integ_time, median_diff_full_frame, median_diff_lhs, median
     diff_method: str
         The method of finding the difference between reads. 
         Either "instantaneous" or "cumulative".
+
+    diff_cube: array-like
+        The difference cube computed from cube with diff_method, if it is already available.
+        Default is None, which computes it.
+
+    downsample: bool
+        Set to True to block average each panel down to its display resolution before
+        drawing it, which makes rendering and saving the figure much faster.
+
+    vmin, vmax: float
+        Data range that the colormap covers. Default is None, which uses the zscale range 
+        of each panel.
     
     Returns:
     --------
@@ -253,6 +1523,9 @@ def panel_plot(cube, integ_time, median_diff_full_frame, median_diff_lhs, median
         The value in white "Ratio" gives the ratio of the median difference in orange 
         for the left versus the right side. 
     '''
+
+    import matplotlib.pyplot as plt
+    import matplotlib.patheffects as path_effects
     
     
     xlabel_list = ["SCI[16-15]","SCI[15-14]","SCI[14-13]","SCI[13-12]","SCI[12-11]",
@@ -264,7 +1537,9 @@ def panel_plot(cube, integ_time, median_diff_full_frame, median_diff_lhs, median
     fig.set_dpi(40)
     itime = integ_time[0:-1] - integ_time[1:]
     
-    diff = compute_diff_imas(cube, integ_time, diff_method = diff_method)
+    if diff_cube is None:
+        diff_cube = compute_diff_imas(cube, integ_time, diff_method = diff_method)
+    diff = diff_cube
  
     
     for i, ax in enumerate(axarr.reshape(-1)):
@@ -272,9 +1547,13 @@ def panel_plot(cube, integ_time, median_diff_full_frame, median_diff_lhs, median
             i=i+1
             
             diff_i = diff[:,:,i]
-            vmin,vmax = zscale(diff_i)
-            im = ax.imshow(np.abs(diff_i), cmap='Greys_r', origin='lower',
-                           vmin = vmin, vmax = vmax)
+            if vmin is None or vmax is None:
+                from ginga.util.zscale import zscale
+                vmin_i, vmax_i = zscale(diff_i)
+            else:
+                vmin_i, vmax_i = vmin, vmax
+            im = show_image(ax, np.abs(diff_i), downsample = downsample, cmap='Greys_r', origin='lower',
+                            vmin = vmin_i, vmax = vmax_i)
             ax.set_title(f'$\mu = ${median_diff_full_frame[i]:.2f}±{standard_dev_fullframe[i]:.2f} e-/s', fontsize = 30)
             
             text = ax.text(50, 500, f'{median_diff_lhs[i]:.3f}\n±\n{standard_dev_lhs[i]:.3f}', color='Orange', fontsize=30)
@@ -306,7 +1585,7 @@ def panel_plot(cube, integ_time, median_diff_full_frame, median_diff_lhs, median
     return fig
     
     
-def plot_ima_subplots(ima_filename, vmin, vmax):
+def plot_ima_subplots(ima_filename, vmin, vmax, downsample = False, return_fig = False):
     '''
     Build a simple panel plot of individual IMA reads.
     
@@ -320,11 +1599,26 @@ def plot_ima_subplots(ima_filename, vmin, vmax):
     
     vmax: float
         Maximum magnitude for scaling the data range that the colormap covers.      
+
+    downsample: bool
+        Set to True to block average each read down to its display resolution before
+        drawing it.
+
+    return_fig: bool
+        Set to True to return the figure, e.g. to save it. By default nothing is returned, 
+        so that the figure is only drawn once in notebooks.
+
+    Returns
+    -------
+    fig_panel1: figure object
+        Panel plot of the individual reads, if return_fig is True.
     '''
+
+    import matplotlib.pyplot as plt
     
     path, filename = os.path.split(ima_filename)
 
-    cube, integ_time = read_wfc3(ima_filename)
+    cube, integ_time = cube_cache.get(ima_filename)
 
     fig_panel1, axarr = plt.subplots(4, 4)
     fig_panel1.set_size_inches(40, 40)
@@ -334,7 +1628,7 @@ def plot_ima_subplots(ima_filename, vmin, vmax):
     read_title=np.arange(16,0,-1)
     for i, ax in enumerate(axarr.reshape(-1)):
 
-        im = ax.imshow(cube[:,:,i], cmap = 'Greys_r', origin = 'lower', vmin = vmin , vmax = vmax) 
+        im = show_image(ax, cube[:,:,i], downsample = downsample, cmap = 'Greys_r', origin = 'lower', vmin = vmin , vmax = vmax) 
 
         cbar=plt.colorbar(im, ax = ax)
         cbar.ax.tick_params(labelsize = 20)
@@ -344,6 +1638,9 @@ def plot_ima_subplots(ima_filename, vmin, vmax):
 
     _=fig_panel1.suptitle(filename, fontsize = 40)
     plt.subplots_adjust(bottom = 0.3, right = 0.9, top = 0.95)
+
+    if return_fig:
+        return fig_panel1
     
     
 def plot_ramp_subplots(ima_files, difference_method, ylims, exclude_sources, lhs_region, rhs_region):
@@ -372,6 +1669,8 @@ def plot_ramp_subplots(ima_files, difference_method, ylims, exclude_sources, lhs
     rhs_region : dict
        The four corners (x0, x1, y0, y1) of the right hand region.
     '''
+
+    import matplotlib.pyplot as plt
     
     fig = plt.figure(figsize = (50, 20))
     fig
@@ -384,13 +1683,16 @@ def plot_ramp_subplots(ima_files, difference_method, ylims, exclude_sources, lhs
         
 
         path, filename = os.path.split(ima)
-        cube, integ_time = read_wfc3(ima)
-        
+        diff_cube, integ_time = cube_cache.get(ima, diff_method = difference_method)
         if exclude_sources == True:
-            cube[np.abs(cube) > 3] = np.nan
-
-        diff_cube = compute_diff_imas(cube, integ_time, diff_method = difference_method)
-        median_diff_fullframe, median_diff_lhs, median_diff_rhs = get_median_fullframe_lhs_rhs(diff_cube, lhs_region = lhs_region, rhs_region = rhs_region)
+            # Exclude the differences involving a read with more than 3 e-/s in a pixel
+            cube, integ_time = cube_cache.get(ima)
+            bright = (cube > 3) | (cube < -3)
+            mask = bright[:, :, 1:] | bright[:, :, 0:-1]
+            del bright
+        else:
+            mask = None
+        median_diff_fullframe, median_diff_lhs, median_diff_rhs = get_median_fullframe_lhs_rhs(diff_cube, lhs_region = lhs_region, rhs_region = rhs_region, mask = mask)
 
         ax = fig.add_subplot(rows, columns, i+1)
         plot_ramp(ima, integ_time, median_diff_fullframe, median_diff_lhs, median_diff_rhs)
@@ -402,7 +1704,8 @@ def plot_ramp_subplots(ima_files, difference_method, ylims, exclude_sources, lhs
         _=ax.set_title(f'{filename}, {subplot_titles[i]}', fontsize=50)
         
         
-def plot_ima_difference_subplots(ima_filename, difference_method, lhs_region, rhs_region):
+def plot_ima_difference_subplots(ima_filename, difference_method, lhs_region, rhs_region, downsample = False,
+                                 vmin = None, vmax = None, return_fig = False):
     '''
     Build a complex panel plot of the difference between individual IMA reads.
     The median difference $\mu$ in the count rate over the entire image is printed above each panel. Below each panel, 
@@ -426,21 +1729,181 @@ def plot_ima_difference_subplots(ima_filename, difference_method, lhs_region, rh
 
     rhs_region : dict
        The four corners (x0, x1, y0, y1) of the right hand region.
-       
-    '''
 
-    path,filename = os.path.split(ima_filename)
+    downsample: bool
+        Set to True to block average each panel down to its display resolution before
+        drawing it.
+
+    vmin, vmax: float
+        Data range that the colormap covers. Default is None, which uses the zscale range 
+        of each panel.
+
+    return_fig: bool
+        Set to True to return the figure, e.g. to save it. By default nothing is returned, 
+        so that the figure is only drawn once in notebooks.
+
+    Returns
+    -------
+    fig_0: figure object
+        Panel plot of the differences between reads, as returned by panel_plot, if 
+        return_fig is True.
+    '''
 
-    cube, integ_time = read_wfc3(ima_filename)
+    import matplotlib.pyplot as plt
 
-    median_fullframe, median_lhs, median_rhs = get_median_fullframe_lhs_rhs(cube, lhs_region = lhs_region, rhs_region = rhs_region)
+    path,filename = os.path.split(ima_filename)
 
-    diff_cube = compute_diff_imas(cube, integ_time, diff_method = difference_method)
+    cube, integ_time = cube_cache.get(ima_filename)
+    diff_cube, integ_time = cube_cache.get(ima_filename, diff_method = difference_method)
 
-    median_diff_fullframe, median_diff_lhs, median_diff_rhs = get_median_fullframe_lhs_rhs(diff_cube, lhs_region = lhs_region, rhs_region = rhs_region)
-    standard_dev_fullframe, standard_dev_lhs, standard_dev_rhs = get_std_fullframe_lhs_rhs(diff_cube, lhs_region = lhs_region, rhs_region = rhs_region)
+    region_stats = get_region_stats(diff_cube, {'full': FULL_FRAME_REGION, 'lhs': lhs_region, 'rhs': rhs_region},
+                                    stats = ('median', 'std'))
+    median_diff_fullframe, median_diff_lhs, median_diff_rhs = [region_stats[name]['median'] for name in ('full', 'lhs', 'rhs')]
+    standard_dev_fullframe, standard_dev_lhs, standard_dev_rhs = [region_stats[name]['std'] for name in ('full', 'lhs', 'rhs')]
 
-    fig_0 = panel_plot(cube, integ_time, median_diff_fullframe, median_diff_lhs, median_diff_rhs, standard_dev_fullframe, standard_dev_lhs, standard_dev_rhs, diff_method = difference_method)
+    fig_0 = panel_plot(cube, integ_time, median_diff_fullframe, median_diff_lhs, median_diff_rhs, standard_dev_fullframe, standard_dev_lhs, standard_dev_rhs, diff_method = difference_method, diff_cube = diff_cube, downsample = downsample,
+                       vmin = vmin, vmax = vmax)
     _=fig_0.suptitle(filename, fontsize = 40)
     plt.subplots_adjust(bottom = 0.25, right = 0.9, top = 0.95)
 
+    if return_fig:
+        return fig_0
+
+
+def render_ima(ima_filename, output_dir = '.', difference_methods = ('instantaneous', 'cumulative'),
+               vmin = 0, vmax = 2, lhs_region = LHS_REGION, rhs_region = RHS_REGION):
+    '''
+    Render the panel plots of the reads and of the differences between reads of an IMA 
+    file to PNG files, with every panel downsampled to its display resolution. The figures
+    are named <rootname>_reads.png and <rootname>_<difference_method>_diff.png.
+
+    Parameters
+    ----------
+    ima_filename : str
+        Path to a RAW full-frame IR image fits file.
+
+    output_dir : str
+        Directory where the PNG files are written.
+
+    difference_methods : list of str
+        The methods of finding the difference between reads to plot, 
+        "instantaneous" and/or "cumulative".
+
+    vmin: float
+        Minimum magnitude for scaling the data range of the reads plot.
+    
+    vmax: float
+        Maximum magnitude for scaling the data range of the reads plot.
+
+    lhs_region:  dict
+       The four corners (x0, x1, y0, y1) of the left hand region.
+
+    rhs_region : dict
+       The four corners (x0, x1, y0, y1) of the right hand region.
+
+    Returns
+    -------
+    png_files : list of str
+        Paths to the PNG files written.
+    '''
+
+    import matplotlib.pyplot as plt
+
+    rootname = os.path.basename(ima_filename).split('_')[0]
+
+    figures = {'reads': plot_ima_subplots(ima_filename, vmin = vmin, vmax = vmax, downsample = True, 
+                                          return_fig = True)}
+    for method in difference_methods:
+        figures[f'{method}_diff'] = plot_ima_difference_subplots(ima_filename, method, lhs_region, rhs_region, 
+                                                                 downsample = True, return_fig = True)
+    
+    png_files = []
+    for name, fig in figures.items():
+        png_file = os.path.join(output_dir, f'{rootname}_{name}.png')
+        fig.savefig(png_file, dpi = fig.dpi)
+        plt.close(fig)
+        png_files.append(png_file)
+
+    return png_files
+
+
+def use_agg_backend():
+    '''
+    Switch matplotlib to the non-interactive Agg backend, e.g. in headless worker processes.
+    '''
+
+    import matplotlib.pyplot as plt
+    plt.switch_backend('Agg')
+
+
+def init_render_worker():
+    '''
+    Set up a render_ima_files worker process: switch to the Agg backend and empty the cube 
+    cache inherited from the parent process, so each worker only caches the files it renders.
+    '''
+
+    use_agg_backend()
+    cube_cache.clear()
+
+
+def render_ima_files(ima_files, output_dir = '.', difference_methods = ('instantaneous', 'cumulative'),
+                     vmin = 0, vmax = 2, lhs_region = LHS_REGION, rhs_region = RHS_REGION, processes = None):
+    '''
+    Render the QA figures of many IMA files to PNG files with render_ima, headless (Agg backend)
+    and concurrently in a pool of worker processes. Files that cannot be rendered are reported 
+    and skipped.
+
+    Parameters
+    ----------
+    ima_files : list of str
+        Paths to RAW full-frame IR image fits files.
+
+    output_dir : str
+        Directory where the PNG files are written. It is created if needed.
+
+    difference_methods : list of str
+        The methods of finding the difference between reads to plot, 
+        "instantaneous" and/or "cumulative".
+
+    vmin: float
+        Minimum magnitude for scaling the data range of the reads plots.
+    
+    vmax: float
+        Maximum magnitude for scaling the data range of the reads plots.
+
+    lhs_region:  dict
+       The four corners (x0, x1, y0, y1) of the left hand region.
+
+    rhs_region : dict
+       The four corners (x0, x1, y0, y1) of the right hand region.
+
+    processes : int
+       Number of worker processes. Default is None, which uses all the CPUs.
+
+    Returns
+    -------
+    png_files : list of str
+        Paths to the PNG files written.
+
+    failures : dict
+        Error message of each file that could not be rendered.
+    '''
+
+    os.makedirs(output_dir, exist_ok = True)
+    render = partial(render_ima, output_dir = output_dir, difference_methods = difference_methods,
+                     vmin = vmin, vmax = vmax, lhs_region = lhs_region, rhs_region = rhs_region)
+    results = {}
+    failures = {}
+    with ProcessPoolExecutor(max_workers = processes, initializer = init_render_worker) as executor:
+        futures = {executor.submit(render, ima): i for i, ima in enumerate(ima_files)}
+        for future in as_completed(futures):
+            try:
+                results[futures[future]] = future.result()
+            except Exception as e:
+                failures[ima_files[futures[future]]] = str(e)
+                print(f'Could not process {ima_files[futures[future]]}: {e}')
+
+    png_files = [png for i in sorted(results) for png in results[i]]
+
+    return png_files, failures
+
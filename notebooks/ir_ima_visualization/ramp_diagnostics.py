@@ -0,0 +1,228 @@
+#! /usr/bin/env python
+
+""" Computes ramp diagnostics for many WFC3/IR IMA files.
+
+This script measures, for every read of every IMA file, the median
+and standard deviation of the difference between reads in the full
+frame and in the left and right hand side regions, together with the
+LHS/RHS ratio and delta, for both the instantaneous and the cumulative
+difference methods. These are the statistics shown by
+``plot_ima_difference_subplots``, computed over whole programs to
+track time-variable background without plotting.
+
+The files are processed across a pool of worker processes and the
+results are written to a single table with one row per rootname and
+IMSET, either as a Parquet file (requires ``pyarrow``) or as the
+``ramp_stats`` table of a SQLite database.
+
+Use
+---
+    This script is intended to be executed via the command line
+    as such:
+    ::
+
+        python ramp_diagnostics.py input [input ...] [-o|--output] [-p|--processes]
+
+    ``input`` - IMA files, directories containing IMA files, or text
+    files listing one IMA file per line.
+
+    ``-o --output`` - Output table, ending in ``.parquet`` or in
+    ``.db``/``.sqlite``. Default is ``ramp_stats.parquet``.
+
+    ``-p --processes`` - Number of worker processes. Default is the
+    number of CPUs.
+
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
+from glob import glob
+import os
+import sqlite3
+
+import numpy as np
+from astropy.table import Table, vstack
+
+from ima_visualization_and_differencing import compute_diff_imas
+from ima_visualization_and_differencing import get_region_stats
+from ima_visualization_and_differencing import read_wfc3_cube
+from ima_visualization_and_differencing import FULL_FRAME_REGION, LHS_REGION, RHS_REGION
+
+DIFF_METHODS = ['instantaneous', 'cumulative']
+
+
+def ramp_statistics(ima_filename, lhs_region=LHS_REGION, rhs_region=RHS_REGION):
+    '''
+    Compute the ramp diagnostics of every read of an IMA file for both
+    difference methods.
+
+    Parameters
+    ----------
+    ima_filename : str
+        Path to a full-frame IR IMA image fits file.
+    lhs_region : dict
+        The four corners (x0, x1, y0, y1) of the left hand region.
+    rhs_region : dict
+        The four corners (x0, x1, y0, y1) of the right hand region.
+
+    Returns
+    -------
+    stats : Table
+        One row per difference between reads, keyed by rootname and the
+        IMSET of the later read, with the median and standard deviation
+        of the full frame, LHS and RHS, the LHS/RHS ratio and the LHS-RHS
+        delta, for each difference method.
+    '''
+
+    cube, integ_time = read_wfc3_cube(ima_filename)
+    cube = cube.transpose(1, 2, 0)
+    nsamp = len(integ_time)
+    k = np.arange(nsamp - 1)
+    rootname = os.path.basename(ima_filename).split('_')[0]
+
+    stats = Table({'rootname': np.full(len(k), rootname),
+                   'imset': nsamp - 1 - k,
+                   'integ_time': integ_time[1:]})
+
+    regions = {'full': FULL_FRAME_REGION, 'lhs': lhs_region, 'rhs': rhs_region}
+    diff_cube = np.empty((nsamp - 1,) + cube.shape[:2], dtype=np.float32).transpose(1, 2, 0)
+    for method in DIFF_METHODS:
+        compute_diff_imas(cube, integ_time, diff_method=method, out=diff_cube)
+        region_stats = get_region_stats(diff_cube, regions, stats=('median', 'std'))
+
+        for name in regions:
+            for stat in ('median', 'std'):
+                stats['{}_{}_{}'.format(method, stat, name)] = region_stats[name][stat]
+
+        lhs, rhs = region_stats['lhs']['median'], region_stats['rhs']['median']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            stats['{}_ratio'.format(method)] = lhs/rhs
+        stats['{}_delta'.format(method)] = lhs - rhs
+
+    return stats
+
+
+def find_ima_files(inputs):
+    '''
+    Expand a list of IMA files, directories and file lists into IMA file
+    names.
+
+    Parameters
+    ----------
+    inputs : list of str
+        IMA files, directories containing IMA files, or text files listing
+        one IMA file per line.
+
+    Returns
+    -------
+    ima_files : list of str
+        Sorted, unique IMA file names.
+    '''
+
+    ima_files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            ima_files += glob(os.path.join(item, '*_ima.fits'))
+        elif item.endswith('.fits'):
+            ima_files.append(item)
+        else:
+            with open(item) as f:
+                ima_files += [line.strip() for line in f if line.strip()]
+
+    return sorted(set(ima_files))
+
+
+def write_table(stats, output):
+    '''
+    Write the ramp diagnostics to a Parquet file or a SQLite database. In
+    a database, rows already present for the same rootname and IMSET are
+    replaced.
+
+    Parameters
+    ----------
+    stats : Table
+        Ramp diagnostics returned by ramp_statistics.
+    output : str
+        Output file name, ending in .parquet, .db or .sqlite.
+    '''
+
+    if output.endswith('.parquet'):
+        stats.write(output, format='parquet', overwrite=True)
+
+    elif output.endswith(('.db', '.sqlite')):
+        columns = stats.colnames
+        with sqlite3.connect(output) as db:
+            db.execute('CREATE TABLE IF NOT EXISTS ramp_stats ({}, PRIMARY KEY (rootname, imset))'.format(
+                       ', '.join(['rootname TEXT', 'imset INTEGER'] + ['{} REAL'.format(c) for c in columns[2:]])))
+            db.executemany('INSERT OR REPLACE INTO ramp_stats ({}) VALUES ({})'.format(
+                           ', '.join(columns), ', '.join('?'*len(columns))),
+                           [(str(row[0]), int(row[1])) + tuple(float(v) for v in row[2:]) for row in stats.iterrows()])
+
+    else:
+        raise ValueError("{} must end in '.parquet', '.db' or '.sqlite'.".format(output))
+
+
+def run_batch(ima_files, output='ramp_stats.parquet', processes=None,
+              lhs_region=LHS_REGION, rhs_region=RHS_REGION):
+    '''
+    Compute the ramp diagnostics of many IMA files across a process pool
+    and write them to a single table. Files that cannot be processed are
+    reported and skipped.
+
+    Parameters
+    ----------
+    ima_files : list of str
+        Paths to full-frame IR IMA image fits files.
+    output : str
+        Output file name, ending in .parquet, .db or .sqlite.
+    processes : int
+        Number of worker processes. Default is None, which uses all the
+        CPUs.
+    lhs_region : dict
+        The four corners (x0, x1, y0, y1) of the left hand region.
+    rhs_region : dict
+        The four corners (x0, x1, y0, y1) of the right hand region.
+
+    Returns
+    -------
+    stats : Table
+        Ramp diagnostics of all the files that were processed.
+    '''
+
+    measure = partial(ramp_statistics, lhs_region=lhs_region, rhs_region=rhs_region)
+
+    tables = []
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = {executor.submit(measure, ima): ima for ima in ima_files}
+        for future in as_completed(futures):
+            try:
+                tables.append(future.result())
+            except Exception as e:
+                print('Could not process {}: {}'.format(futures[future], e))
+
+    if len(tables) == 0:
+        raise ValueError('None of the {} IMA files could be processed.'.format(len(ima_files)))
+
+    stats = vstack(tables)
+    stats.sort(['rootname', 'imset'])
+    write_table(stats, output)
+    print('Wrote ramp diagnostics of {} of {} files to {}'.format(len(tables), len(ima_files), output))
+
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compute ramp diagnostics for many WFC3/IR IMA files.')
+    parser.add_argument('inputs', nargs='+',
+                        help='IMA files, directories containing IMA files, or text files listing IMA files.')
+    parser.add_argument('-o', '--output', default='ramp_stats.parquet',
+                        help="Output table ending in '.parquet', '.db' or '.sqlite'.")
+    parser.add_argument('-p', '--processes', type=int, default=None,
+                        help='Number of worker processes. Default is the number of CPUs.')
+    args = parser.parse_args()
+
+    run_batch(find_ima_files(args.inputs), output=args.output, processes=args.processes)
+
+
+if __name__ == '__main__':
+    main()
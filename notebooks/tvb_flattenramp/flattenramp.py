@@ -0,0 +1,202 @@
+#! /usr/bin/env python
+
+""" Flattens the ramps of WFC3/IR IMA files affected by time-variable background.
+
+This module applies the "flatten-ramp" technique of WFC3 ISR 2016-16, as
+walked through in ``TVB_flattenramp_notebook.ipynb``, to IMA files
+calibrated with CRCORR=OMIT: the median count rate of every read is
+replaced by the count rate of the full exposure, and CRCORR is switched
+back on so that calwf3 can be rerun on the IMA for the ramp fitting.
+
+The SCI arrays are memory-mapped straight from the IMA, the medians of
+all the reads are computed at once and the offsets are added in place,
+so only the SCI data blocks and the headers are rewritten. The CHECKSUM
+and DATASUM keywords of the updated extensions are removed, since they
+no longer match. IMA files that were not calibrated with CRCORR=OMIT
+are rejected, and files that cannot be corrected are reported and
+skipped.
+
+Use
+---
+    This script is intended to be executed via the command line
+    as such:
+    ::
+
+        python flattenramp.py ima_file [ima_file ...] [-p|--processes]
+
+    ``ima_file`` - IMA files to correct in place.
+
+    ``-p --processes`` - Number of worker processes. Default is the
+    number of CPUs.
+
+"""
+import argparse
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
+
+import numpy as np
+from astropy.io import fits
+
+# The whole image, minus the 5 pixel wide overscan regions
+STATS_REGION = [[5, 1014], [5, 1014]]
+
+
+def map_sci_reads(ima_filename, mode='r'):
+    '''
+    Memory-map the SCI arrays of every read but the zero read of an IMA file.
+
+    Parameters
+    ----------
+    ima_filename : str
+        Path to a full-frame IR IMA image fits file.
+    mode : str
+        Mode of the memory map, 'r' to read or 'r+' to update the file.
+
+    Returns
+    -------
+    reads : array-like
+        (NSAMP-1)x1024x1024 big-endian float32 view of SCI,1 to SCI,NSAMP-1,
+        in the order of the extensions. Calibrated IMA files store their
+        IMSETs at a constant stride, so this is a single strided view of the
+        file.
+    '''
+
+    with fits.open(ima_filename, memmap=True) as ima:
+        nsamp = ima[0].header['NSAMP']
+        hdr = ima['SCI', 1].header
+        if hdr['BITPIX'] != -32 or 'BSCALE' in hdr or 'BZERO' in hdr:
+            raise ValueError('{} SCI arrays must be unscaled float32.'.format(ima_filename))
+        shape = (nsamp - 1, hdr['NAXIS2'], hdr['NAXIS1'])
+        offsets = np.array([ima['SCI', i].fileinfo()['datLoc'] for i in range(1, nsamp)])
+
+    strides = np.diff(offsets)
+    if len(strides) > 0 and np.any(strides != strides[0]):
+        raise ValueError('{} IMSETs are not stored at a constant stride.'.format(ima_filename))
+    stride = strides[0] if len(strides) > 0 else 0
+
+    buffer = np.memmap(ima_filename, dtype=np.uint8, mode=mode)
+    return np.ndarray(shape, dtype='>f4', buffer=buffer, offset=offsets[0],
+                      strides=(stride, 4*shape[2], 4))
+
+
+def flatten_ramp(ima_filename, stats_region=STATS_REGION, crcorr='PERFORM'):
+    '''
+    Subtract the median count rate of each read of an IMA file from that
+    read and add back the count rate of the full exposure, in place. The
+    CHECKSUM and DATASUM keywords of the primary header and of the updated
+    SCI extensions are removed.
+
+    Parameters
+    ----------
+    ima_filename : str
+        Path to a full-frame IR IMA image fits file calibrated with
+        CRCORR=OMIT.
+    stats_region : list
+        [[x0, x1], [y0, y1]] region used for the median background.
+    crcorr : str
+        Value of CRCORR written to the IMA, 'PERFORM' to turn the ramp
+        fitting back on for the next calwf3 run.
+
+    Returns
+    -------
+    median : array-like
+        Median background count rate of SCI,1 to SCI,NSAMP-1 before the
+        correction.
+    '''
+
+    # A ramp that was already fit would be rescaled a second time
+    if fits.getval(ima_filename, 'CRCORR') != 'OMIT':
+        raise ValueError('{} must be calibrated with CRCORR=OMIT, not {}.'.format(
+            ima_filename, fits.getval(ima_filename, 'CRCORR')))
+
+    slx = slice(stats_region[0][0], stats_region[0][1])
+    sly = slice(stats_region[1][0], stats_region[1][1])
+
+    reads = map_sci_reads(ima_filename, mode='r+')
+    median = np.median(reads[:, sly, slx], axis=(1, 2))
+
+    # SCI,1 is the full exposure count rate
+    reads += (median[0] - median)[:, None, None].astype(np.float32)
+    reads.base.flush()
+    nreads = len(reads)
+    del reads
+
+    with fits.open(ima_filename, mode='update') as ima:
+        ima[0].header['CRCORR'] = crcorr
+        for hdr in [ima[0].header] + [ima['SCI', i].header for i in range(1, nreads + 1)]:
+            hdr.remove('CHECKSUM', ignore_missing=True)
+            hdr.remove('DATASUM', ignore_missing=True)
+
+    return median
+
+
+def flatten_ramps(ima_files, stats_region=STATS_REGION, crcorr='PERFORM', processes=None):
+    '''
+    Flatten the ramps of many IMA files in place, in parallel. Files that
+    cannot be corrected are reported and skipped.
+
+    Parameters
+    ----------
+    ima_files : list of str
+        Paths to full-frame IR IMA image fits files calibrated with
+        CRCORR=OMIT.
+    stats_region : list
+        [[x0, x1], [y0, y1]] region used for the median background.
+    crcorr : str
+        Value of CRCORR written to the IMAs.
+    processes : int
+        Number of worker processes. Default is None, which uses all the
+        CPUs. Set to 1 to correct the files in this process.
+
+    Returns
+    -------
+    medians : dict
+        Median background count rate of SCI,1 to SCI,NSAMP-1 of each file
+        that was corrected, as returned by flatten_ramp.
+    failures : dict
+        Error message of each file that could not be corrected.
+    '''
+
+    flatten = partial(flatten_ramp, stats_region=stats_region, crcorr=crcorr)
+    medians = {}
+    failures = {}
+    if processes == 1:
+        for ima in ima_files:
+            try:
+                medians[ima] = flatten(ima)
+            except Exception as e:
+                failures[ima] = str(e)
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            futures = {executor.submit(flatten, ima): ima for ima in ima_files}
+            for future in as_completed(futures):
+                try:
+                    medians[futures[future]] = future.result()
+                except Exception as e:
+                    failures[futures[future]] = str(e)
+
+    for ima in ima_files:
+        if ima in failures:
+            print('Could not process {}: {}'.format(ima, failures[ima]))
+
+    return {ima: medians[ima] for ima in ima_files if ima in medians}, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Flatten the ramps of WFC3/IR IMA files in place.')
+    parser.add_argument('ima_files', nargs='+', help='IMA files calibrated with CRCORR=OMIT.')
+    parser.add_argument('-p', '--processes', type=int, default=None,
+                        help='Number of worker processes. Default is the number of CPUs.')
+    args = parser.parse_args()
+
+    medians, failures = flatten_ramps(args.ima_files, processes=args.processes)
+    for ima_filename, median in medians.items():
+        for i, med in enumerate(median):
+            print('%s, [SCI,%d], median_bkg: %.2f' % (ima_filename, i+1, med))
+    if len(failures) > 0:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()